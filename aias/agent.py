@@ -1,44 +1,143 @@
 # aias/agent.py
 
 import os
+import re
 import sys
 import threading
-from datetime import datetime
+import time
 from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
 
 from aias.core import (
     MODEL, OLLAMA_URL,
     ask_llm, ask_chat,
     index_files, resolve_path,
-    classify_command, detect_traceback_issue,
-    background_tasks, completed_tasks, enqueue_patch,
-    log_interaction
+    classify_command, detect_traceback_issue, scan_tracebacks,
+    background_tasks, completed_tasks, enqueue_patch, complete_patch,
+    log_interaction, known_files, LLMCancelled, load_config
 )
 from aias.utils.patcher import safe_update_file
+from aias.utils.patch_archive import get_archive
+from aias.conversation import ConversationContext
+from aias.router import get_router
 
 # Ensure memory folders
 os.makedirs("memory", exist_ok=True)
-os.makedirs("memory/patch_notes", exist_ok=True)
 LOG_FILE = Path("memory/logs.jsonl")
 LOG_FILE.touch(exist_ok=True)
 
-# Background worker to apply patches
+# Conversation memory for the REPL and GUI; server sessions bring their own
+default_context = ConversationContext()
+
+# (file, line, exception) of traceback issues already queued, oldest first
+_reported_issues: "OrderedDict[Tuple[str, int, str], None]" = OrderedDict()
+_reported_lock = threading.Lock()
+MAX_REPORTED_ISSUES = 1000
+
+def _first_report(signature: Tuple[str, int, str]) -> bool:
+    """
+    True the first time an issue signature is seen (within a bounded memory).
+    """
+    with _reported_lock:
+        if signature in _reported_issues:
+            return False
+        _reported_issues[signature] = None
+        if len(_reported_issues) > MAX_REPORTED_ISSUES:
+            _reported_issues.popitem(last=False)
+        return True
+
+# Long-term memory: how many past turns to recall, and how similar they must be
+_memory_conf = load_config().get("memory", {}) or {}
+MEMORY_ENABLED = _memory_conf.get("enabled", True)
+MEMORY_TOP_K = _memory_conf.get("top_k", 4)
+MEMORY_MIN_SCORE = _memory_conf.get("min_score", 0.35)
+
+def _recall(user_text: str) -> List[Tuple[str, str]]:
+    """
+    Past (user, ai) turns related to `user_text`; empty if memory is off,
+    not built yet, or its dependencies are missing.
+    """
+    if not MEMORY_ENABLED:
+        return []
+    try:
+        from aias.utils.vector_memory import get_memory
+        hits = get_memory().recall(user_text, k=MEMORY_TOP_K, min_score=MEMORY_MIN_SCORE)
+    except Exception as e:
+        print(f"⚠️ Memory recall failed: {e}")
+        return []
+    return [(h["user"], h["ai"]) for h in hits]
+
+# Words in "where is the function X defined" that are never the symbol asked for
+_LOCATE_STOPWORDS = {
+    "where", "is", "are", "the", "a", "an", "find", "locate", "me", "please",
+    "function", "func", "method", "class", "variable", "constant", "symbol",
+    "module", "defined", "definition", "def", "declared", "in", "of", "for",
+}
+MAX_SYMBOL_HITS = 5
+
+def _locate_symbols(user_text: str) -> List[Tuple[str, List[dict]]]:
+    """
+    (name, definitions) for each identifier in a locate query that the
+    symbol index knows about.
+    """
+    from aias.utils.symbol_index import get_symbol_index
+    index = get_symbol_index()
+    found = []
+    for name in dict.fromkeys(re.findall(r"[A-Za-z_][\w.]*\w|[A-Za-z_]", user_text)):
+        if name.lower() in _LOCATE_STOPWORDS:
+            continue
+        hits = index.lookup(name, limit=MAX_SYMBOL_HITS)
+        if hits:
+            found.append((name, hits))
+    return found
+
+MAX_TASKS_SHOWN = 20
+
+def _format_tasks() -> str:
+    """
+    One line per task from the scheduler snapshot: active first, then recent history.
+    """
+    tasks = background_tasks.snapshot()
+    if not tasks:
+        return "📋 No background tasks."
+    lines = []
+    for t in tasks[:MAX_TASKS_SHOWN]:
+        timing = f"waited {t['wait_s']:.0f}s"
+        if t["run_s"] is not None:
+            timing += f", ran {t['run_s']:.0f}s"
+        desc = t["desc"] if len(t["desc"]) <= 60 else t["desc"][:57] + "..."
+        lines.append(f"#{t['id']} [{t['state']}] {t['kind']} {t['path']}: {desc} ({timing})")
+    if len(tasks) > MAX_TASKS_SHOWN:
+        lines.append(f"… and {len(tasks) - MAX_TASKS_SHOWN} more")
+    stats = background_tasks.stats()
+    return (f"📋 Tasks: {stats['queued']} queued, {stats['running']} running\n" +
+            "\n".join(lines))
+
+# Background worker to apply patches, highest priority first
 def _background_worker():
     while True:
-        task = background_tasks.get()
+        task = background_tasks.next()
         if task is None:
             break
-        filename, description = task
-        _propose_and_save_patch(filename, description)
-        completed_tasks.append((filename, description))
-        background_tasks.task_done()
+        try:
+            _propose_and_save_patch(task.path, task.desc, task)
+        except Exception as e:
+            print(f"❌ Patch task #{task.id} failed: {e}")
+            background_tasks.finish(task, e)
+            continue
+        if not task.cancel_requested:
+            complete_patch(task.path, task.desc)
+        background_tasks.finish(task)
 
 threading.Thread(target=_background_worker, daemon=True).start()
 
-def _propose_and_save_patch(filename: str, task_description: str):
+def _propose_and_save_patch(filename: str, task_description: str, task=None):
     """
     Generate a code patch for `filename` based on `task_description` and
-    ask the user for approval before applying.
+    ask the user for approval before applying. If `task` (a scheduler
+    Task) is cancelled meanwhile, the patch is dropped before it is
+    archived or applied.
     """
     if not os.path.exists(filename):
         print(f"❌ Cannot propose patch: {filename} not found.")
@@ -53,31 +152,55 @@ def _propose_and_save_patch(filename: str, task_description: str):
         f"Updated Code (only include Python code, no commentary):"
     )
     result = ask_llm(prompt)
+    if task is not None and task.cancel_requested:
+        print(f"🛑 Patch task #{task.id} cancelled; proposal discarded.")
+        return
     # extract code block if present
     import re
     m = re.search(r"```(?:python\n)?([\s\S]+?)```", result)
     code = m.group(1).rstrip() if m else result.strip()
 
     # save patch to memory
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    patch_file = Path(f"memory/patch_notes/{Path(filename).stem}_{stamp}.patch")
-    patch_file.write_text(code, encoding="utf-8")
-    print(f"📌 Patch saved to {patch_file}")
+    digest = get_archive().add(filename, code, kind="proposal")
+    print(f"📌 Patch saved to archive as {digest[:12]}")
 
     # ask for approval
     apply_it = input(f"❓ Apply this patch to {filename}? (y/n): ").strip().lower()
-    if apply_it == "y":
+    if task is not None and task.cancel_requested:
+        print(f"🛑 Patch task #{task.id} cancelled; patch not applied.")
+    elif apply_it == "y":
         safe_update_file(filename, code)
         print(f"✅ Applied patch to {filename}.")
     else:
         print("🛑 Patch not applied.")
 
-def handle_input(user_text: str) -> str:
+def handle_input(user_text: str,
+                 on_token: Optional[Callable[[str], None]] = None,
+                 context: Optional[ConversationContext] = None,
+                 refresh_index: bool = True) -> str:
     """
     Process a single user message and return AIAS's reply.
+    Safe to call from several threads at once. If `on_token` is given, an
+    LLM reply is streamed through it chunk by chunk; raising LLMCancelled
+    from the callback aborts the request. `context` is the conversation
+    memory to use (the process-wide default_context if omitted). Callers
+    that keep the file index fresh themselves (the server) pass
+    refresh_index=False to skip the per-message walk.
     """
     # refresh index
-    index_files(os.getcwd())
+    if refresh_index:
+        index_files(os.getcwd())
+
+    # Background task status and control
+    if re.fullmatch(r"\s*(show\s+)?tasks\s*", user_text, re.I):
+        return _format_tasks()
+    m = re.fullmatch(r"\s*cancel\s+task\s+#?(\d+)\s*", user_text, re.I)
+    if m:
+        task_id = int(m.group(1))
+        if background_tasks.cancel(task_id):
+            return f"🛑 Cancelled task #{task_id}."
+        return f"⚠️ Task #{task_id} is not queued or running."
+
     pc = classify_command(user_text)
 
     # Reflect
@@ -89,11 +212,10 @@ def handle_input(user_text: str) -> str:
         queued = []
         for insight in lines:
             # extract filename or default to agent.py
-            import re
             m = re.search(r"`([^`]+\.py)`", insight)
             fn = m.group(1) if m else "agent.py"
             path = resolve_path(fn) or fn
-            enqueue_patch(path, insight)
+            enqueue_patch(path, insight, kind="reflect")
             queued.append(f"[{path}] {insight}")
         if queued:
             return (
@@ -114,13 +236,16 @@ def handle_input(user_text: str) -> str:
             "`implement feature <description>` when ready."
         )
 
-    # Locate files
+    # Locate files and symbols
     if pc["type"] == "locate":
         replies = []
         for fn in pc["filenames"]:
             path = resolve_path(fn)
             replies.append(f"I see '{fn}' at '{path or 'not found'}'.")
-        return "\n".join(replies) if replies else "No matching files found."
+        for name, hits in _locate_symbols(user_text):
+            for h in hits:
+                replies.append(f"{h['kind'].capitalize()} '{h['qualname']}' is defined at {h['file']}:{h['line']}.")
+        return "\n".join(replies) if replies else "No matching files or symbols found."
 
     # Patch on-demand
     if pc["type"] == "patch" and pc.get("filenames"):
@@ -137,24 +262,54 @@ def handle_input(user_text: str) -> str:
     # Model inspection
     if any(k in user_text.lower() for k in ("inspect model","model stats")):
         from aias.commands.InspectModelCommand import InspectModelCommand
-        stats = InspectModelCommand().execute()
+        # anything after the trigger phrase, e.g. "hist" or "diff a.pth b.pth"
+        m = re.search(r"(?:inspect model|model stats)\s*(.*)", user_text, re.IGNORECASE)
+        stats = InspectModelCommand().execute(m.group(1).strip() if m else None)
         return f"🔍 Model parameter stats:\n{stats}"
 
-    # Traceback detection
-    fn, desc = detect_traceback_issue(user_text)
-    if fn:
-        rel = resolve_path(Path(fn).name) or fn
-        enqueue_patch(rel, desc)
-        return f"🔍 Detected error in {rel}, queued a proposed fix."
+    # Traceback detection: every distinct issue in the paste, each queued once
+    issues = list(scan_tracebacks(user_text))
+    if issues:
+        queued = []
+        for issue in issues:
+            rel = resolve_path(Path(issue["file"]).name) or issue["file"]
+            if _first_report((rel, issue["line"], issue["exception"])):
+                enqueue_patch(rel, issue["description"], kind="traceback")
+                queued.append(rel)
+        if not queued:
+            return "🔍 Those errors are already queued for a fix."
+        if len(issues) == 1:
+            return f"🔍 Detected error in {queued[0]}, queued a proposed fix."
+        return (
+            f"🔍 Detected {len(issues)} distinct error(s); queued {len(queued)} proposed fix(es):\n" +
+            "\n".join(f"- {q}" for q in queued)
+        )
 
-    # Fallback: chat via LLM
-    prompt = build_prompt = (
+    # Fallback: chat via LLM, with bounded conversation memory
+    header = (
         f"You are AIAS, Ricky’s local AI assistant.\n"
         f"You can read/write files, suggest patches, and chat fluidly.\n"
-        f"Known files:\n- " + "\n- ".join(known_files) +
-        f"\n\n[User]: {user_text}\n[AIAS]:"
+        f"Known files:\n- " + "\n- ".join(known_files) + "\n"
     )
-    reply = ask_llm(prompt)
+    context = context or default_context
+
+    # Tier 1: a confident DQN pick from the canned reply pool
+    router = get_router()
+    reply, decision = router.route(user_text, context.last_reply)
+    if reply is not None:
+        if on_token:
+            on_token(reply)
+        context.add_turn(user_text, reply)
+        log_interaction(user_text, reply)
+        return reply
+
+    # Tier 2: the LLM; the prefix (header + summary) is prefilled once and
+    # its KV state reused. Related past turns go in the suffix.
+    start = time.perf_counter()
+    prefix, suffix = context.prompt_parts(header, user_text, _recall(user_text))
+    reply = context.prefix_cache.generate(prefix, suffix, on_token=on_token)
+    router.record("llm", (time.perf_counter() - start) * 1000, decision)
+    context.add_turn(user_text, reply)
     log_interaction(user_text, reply)
     return reply
 
@@ -3,20 +3,294 @@
 import os
 import sys
 import re
+import threading
+from itertools import count
 from pathlib import Path
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QPushButton, QTextEdit, QMessageBox, QListWidget, QHBoxLayout
+    QPushButton, QTextEdit, QMessageBox, QListWidget, QListWidgetItem, QHBoxLayout,
+    QListView, QAbstractItemView
+)
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import (
+    QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
 )
-from PyQt5.QtCore import QTimer
 
 # ensure project root in path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from aias.agent import handle_input, background_tasks, completed_tasks, _propose_and_save_patch, resolve_path
+from aias.agent import handle_input, _propose_and_save_patch, resolve_path
+from aias.core import (
+    LLMCancelled, subscribe_patches, unsubscribe_patches, remove_patch,
+    read_interactions_before, background_tasks
+)
+
+# Max requests handled at once; further sends wait in the pool's queue
+MAX_INFLIGHT = 4
+# Messages kept in the transcript view at once, and how many page in per scroll
+TRANSCRIPT_MAX_ROWS = 500
+TRANSCRIPT_PAGE = 50
+
+class RequestSignals(QObject):
+    """
+    Signals a RequestWorker emits back to the GUI thread, tagged with the
+    request id. Cross-thread emits are queued, so slots always run on the
+    event loop.
+    """
+    progress = pyqtSignal(int, str)
+    partial  = pyqtSignal(int, str)
+    finished = pyqtSignal(int, str)
+    failed   = pyqtSignal(int, str)
+
+class RequestWorker(QRunnable):
+    """
+    Run handle_input for one message on a pool thread, streaming LLM
+    chunks through `partial`. cancel() is cooperative: it takes effect at
+    the next streamed chunk, or discards the reply if none are streamed.
+    """
+
+    def __init__(self, req_id: int, user_text: str):
+        super().__init__()
+        self.req_id = req_id
+        self.user_text = user_text
+        self.signals = RequestSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        if self._cancelled.is_set():
+            self.signals.failed.emit(self.req_id, "🛑 Cancelled")
+            return
+        self.signals.progress.emit(self.req_id, "⏳ Working…")
+
+        def on_token(chunk: str):
+            if self._cancelled.is_set():
+                raise LLMCancelled()
+            self.signals.partial.emit(self.req_id, chunk)
+
+        try:
+            reply = handle_input(self.user_text, on_token=on_token)
+        except LLMCancelled:
+            self.signals.failed.emit(self.req_id, "🛑 Cancelled")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.req_id, f"⚠️ Exception in handle_input: {e}")
+            return
+        if self._cancelled.is_set():
+            self.signals.failed.emit(self.req_id, "🛑 Cancelled")
+        else:
+            self.signals.finished.emit(self.req_id, reply)
+
+class PatchListModel(QAbstractListModel):
+    """
+    Patch proposals as a list model. Rows are inserted and removed one at a
+    time as the patch pipeline reports changes, so the view keeps its
+    selection and nothing is redrawn while idle.
+    """
+    # Bridges listener calls from worker threads onto the GUI thread
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.changed.connect(self._apply)
+        self._listener = self.changed.emit
+        self._rows = subscribe_patches(self._listener)
+
+    def close(self):
+        unsubscribe_patches(self._listener)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        fn, desc = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{fn}: {desc}"
+        if role == Qt.UserRole:
+            return (fn, desc)
+        return None
+
+    def _apply(self, event: str, task):
+        if event == "added":
+            row = len(self._rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._rows.append(task)
+            self.endInsertRows()
+        elif event == "removed" and task in self._rows:
+            row = self._rows.index(task)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+
+class TaskListModel(QAbstractListModel):
+    """
+    Background patch tasks from the scheduler, one row per task with its
+    state and timings. Rows are updated in place from scheduler events and
+    removed when the scheduler drops them from its history.
+    """
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.changed.connect(self._apply)
+        self._listener = self.changed.emit
+        self._rows = background_tasks.subscribe(self._listener)
+
+    def close(self):
+        background_tasks.unsubscribe(self._listener)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        t = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            timing = f"waited {t['wait_s']:.0f}s"
+            if t["run_s"] is not None:
+                timing += f", ran {t['run_s']:.0f}s"
+            return f"#{t['id']} [{t['state']}] {t['path']}: {t['desc']} ({timing})"
+        if role == Qt.UserRole:
+            return t["id"]
+        return None
+
+    def _row_of(self, task_id):
+        for row, t in enumerate(self._rows):
+            if t["id"] == task_id:
+                return row
+        return None
+
+    def _apply(self, event: str, task):
+        row = self._row_of(task["id"])
+        if event == "evicted":
+            if row is not None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+        elif row is not None:
+            self._rows[row] = task
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+        else:
+            # Newest tasks go at the top
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._rows.insert(0, task)
+            self.endInsertRows()
+
+class TranscriptModel(QAbstractListModel):
+    """
+    Chat transcript holding a bounded window of (speaker, text) rows. The
+    view only lays out and paints what is on screen; rows pushed out of the
+    window are kept as plain strings in `_above` / `_below` and paged back
+    in on demand. Beyond what this session has seen, older history is read
+    backwards from the interaction log.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._above = []        # rows evicted from the top, nearest last
+        self._below = []        # rows evicted from the bottom, nearest last
+        self._log_offset = None # next log page ends here (None = end of file)
+        self._log_exhausted = False
+        self._bold = QFont()
+        self._bold.setBold(True)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        speaker, text = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{speaker}: {text}"
+        if role == Qt.FontRole and speaker == "You":
+            return self._bold
+        return None
+
+    @property
+    def has_newer(self) -> bool:
+        return bool(self._below)
+
+    def append(self, speaker: str, text: str):
+        """
+        Add a new message at the bottom, first jumping back to the newest
+        rows if the user had paged away from them.
+        """
+        while self._below:
+            self.page_newer()
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append((speaker, text))
+        self.endInsertRows()
+        self._trim_top()
+
+    def page_older(self) -> int:
+        """
+        Prepend up to one page of older rows. Returns how many were added.
+        """
+        older = []
+        while self._above and len(older) < TRANSCRIPT_PAGE:
+            older.append(self._above.pop())
+        older.reverse()
+        if len(older) < TRANSCRIPT_PAGE and not self._above and not self._log_exhausted:
+            entries, self._log_offset = read_interactions_before(self._log_offset, TRANSCRIPT_PAGE // 2)
+            if not entries:
+                self._log_exhausted = True
+            logged = []
+            for e in entries:
+                logged.append(("You", e.get("user", "")))
+                logged.append(("AIAS", e.get("ai", "")))
+            older = logged + older
+        if not older:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(older) - 1)
+        self._rows[:0] = older
+        self.endInsertRows()
+        self._trim_bottom()
+        return len(older)
+
+    def page_newer(self) -> int:
+        """
+        Append up to one page of rows previously evicted from the bottom.
+        """
+        newer = []
+        while self._below and len(newer) < TRANSCRIPT_PAGE:
+            newer.append(self._below.pop())
+        if not newer:
+            return 0
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row + len(newer) - 1)
+        self._rows.extend(newer)
+        self.endInsertRows()
+        self._trim_top()
+        return len(newer)
+
+    def _trim_top(self):
+        extra = len(self._rows) - TRANSCRIPT_MAX_ROWS
+        if extra > 0:
+            self.beginRemoveRows(QModelIndex(), 0, extra - 1)
+            self._above.extend(self._rows[:extra])
+            del self._rows[:extra]
+            self.endRemoveRows()
+
+    def _trim_bottom(self):
+        extra = len(self._rows) - TRANSCRIPT_MAX_ROWS
+        if extra > 0:
+            keep = len(self._rows) - extra
+            self.beginRemoveRows(QModelIndex(), keep, len(self._rows) - 1)
+            self._below.extend(reversed(self._rows[keep:]))
+            del self._rows[keep:]
+            self.endRemoveRows()
 
 class GuiMainWindow(QMainWindow):
     def __init__(self):
@@ -28,23 +302,60 @@ class GuiMainWindow(QMainWindow):
         self.setCentralWidget(central)
         layout = QVBoxLayout(central)
 
-        # Chat display
-        self.chatbox = QTextEdit()
-        self.chatbox.setReadOnly(True)
+        # Chat display: virtualized, bounded transcript
+        self.transcript = TranscriptModel(self)
+        self.chatbox = QListView()
+        self.chatbox.setModel(self.transcript)
+        self.chatbox.setWordWrap(True)
+        self.chatbox.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chatbox.setSelectionMode(QAbstractItemView.NoSelection)
+        self.chatbox.verticalScrollBar().valueChanged.connect(self.on_transcript_scroll)
         layout.addWidget(self.chatbox)
+        self.transcript.page_older()
+        self.chatbox.scrollToBottom()
 
         # Input box
         self.input_box = QTextEdit()
         self.input_box.setFixedHeight(60)
         layout.addWidget(self.input_box)
 
-        # Send button
+        # Send / Cancel row
+        send_row = QHBoxLayout()
         self.exec_btn = QPushButton("Send")
         self.exec_btn.clicked.connect(self.on_send)
-        layout.addWidget(self.exec_btn)
+        self.cancel_btn = QPushButton("Cancel Request")
+        self.cancel_btn.clicked.connect(self.on_cancel)
+        send_row.addWidget(self.exec_btn)
+        send_row.addWidget(self.cancel_btn)
+        layout.addLayout(send_row)
+
+        # In-flight requests with their status / streamed text
+        self.inflight_list = QListWidget()
+        self.inflight_list.setFixedHeight(80)
+        layout.addWidget(self.inflight_list)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_INFLIGHT)
+        self._req_ids = count(1)
+        # req_id → (worker, status item, streamed text so far)
+        self._inflight = {}
+
+        # Background patch tasks with their state; queued ones can be cancelled
+        self.task_model = TaskListModel(self)
+        self.task_list = QListView()
+        self.task_list.setModel(self.task_model)
+        self.task_list.setUniformItemSizes(True)
+        self.task_list.setFixedHeight(80)
+        layout.addWidget(self.task_list)
+        self.cancel_task_btn = QPushButton("Cancel Selected Task")
+        self.cancel_task_btn.clicked.connect(self.on_cancel_task)
+        layout.addWidget(self.cancel_task_btn)
 
-        # Patch request list
-        self.patch_list = QListWidget()
+        # Patch request list, updated by events from the patch pipeline
+        self.patch_model = PatchListModel(self)
+        self.patch_list = QListView()
+        self.patch_list.setModel(self.patch_model)
+        self.patch_list.setUniformItemSizes(True)
         layout.addWidget(self.patch_list)
 
         # Approve/Decline row
@@ -58,46 +369,93 @@ class GuiMainWindow(QMainWindow):
         self.approve_btn.clicked.connect(self.on_approve)
         self.decline_btn.clicked.connect(self.on_decline)
 
-        # Timer to refresh patch list every second
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.refresh_patches)
-        self.timer.start(1000)
-
     def on_send(self):
         user_text = self.input_box.toPlainText().strip()
         if not user_text:
             return
         # display user
-        self.chatbox.append(f"<b>You:</b> {user_text}")
-        # process input
-        try:
-            ai_reply = handle_input(user_text)
-        except Exception as e:
-            ai_reply = f"⚠️ Exception in handle_input: {e}"
-        # display AI
-        for line in ai_reply.splitlines():
-            self.chatbox.append(f"<b>AIAS:</b> {line}")
+        self._show_message("You", user_text)
         self.input_box.clear()
 
-    def refresh_patches(self):
+        # process input off the event loop
+        req_id = next(self._req_ids)
+        worker = RequestWorker(req_id, user_text)
+        worker.signals.progress.connect(self.on_request_progress)
+        worker.signals.partial.connect(self.on_request_partial)
+        worker.signals.finished.connect(self.on_request_finished)
+        worker.signals.failed.connect(self.on_request_finished)
+
+        item = QListWidgetItem(f"#{req_id} queued: {user_text[:60]}")
+        item.setData(Qt.UserRole, req_id)
+        self.inflight_list.addItem(item)
+        self._inflight[req_id] = (worker, item, "")
+        self.pool.start(worker)
+
+    def on_cancel(self):
         """
-        Show any pending background tasks that have completed.
+        Cancel the selected in-flight request, or all of them if none is selected.
         """
-        self.patch_list.clear()
-        for fn, desc in completed_tasks:
-            self.patch_list.addItem(f"{fn}: {desc}")
+        item = self.inflight_list.currentItem()
+        targets = [item.data(Qt.UserRole)] if item else list(self._inflight)
+        for req_id in targets:
+            entry = self._inflight.get(req_id)
+            if entry:
+                entry[0].cancel()
+                entry[1].setText(f"#{req_id} cancelling…")
+
+    def on_request_progress(self, req_id: int, status: str):
+        entry = self._inflight.get(req_id)
+        if entry:
+            entry[1].setText(f"#{req_id} {status}")
+
+    def on_request_partial(self, req_id: int, chunk: str):
+        entry = self._inflight.get(req_id)
+        if not entry:
+            return
+        worker, item, text = entry
+        text += chunk
+        self._inflight[req_id] = (worker, item, text)
+        # show the tail of the streamed reply on one line
+        item.setText(f"#{req_id} ✍️ {text[-80:].replace(chr(10), ' ')}")
+
+    def on_request_finished(self, req_id: int, ai_reply: str):
+        entry = self._inflight.pop(req_id, None)
+        if entry:
+            self.inflight_list.takeItem(self.inflight_list.row(entry[1]))
+        # display AI
+        self._show_message("AIAS", ai_reply)
+
+    def _show_message(self, speaker: str, text: str):
+        self.transcript.append(speaker, text)
+        self.chatbox.scrollToBottom()
+
+    def on_transcript_scroll(self, value: int):
+        """
+        Page older history in at the top and evicted rows back in at the
+        bottom, keeping the row under the viewport in place.
+        """
+        bar = self.chatbox.verticalScrollBar()
+        if value == bar.minimum():
+            anchor = self.chatbox.indexAt(self.chatbox.viewport().rect().topLeft()).row()
+            added = self.transcript.page_older()
+            if added:
+                self.chatbox.scrollTo(self.transcript.index(max(anchor, 0) + added),
+                                      QAbstractItemView.PositionAtTop)
+        elif value == bar.maximum() and self.transcript.has_newer:
+            self.transcript.page_newer()
+
+    def _selected_patch(self):
+        index = self.patch_list.currentIndex()
+        return index.data(Qt.UserRole) if index.isValid() else None
 
     def on_approve(self):
         """
         Apply the selected patch immediately.
         """
-        item = self.patch_list.currentItem()
-        if not item:
+        selected = self._selected_patch()
+        if not selected:
             return
-        text = item.text()
-        fn, desc = text.split(":", 1)
-        fn = fn.strip()
-        desc = desc.strip()
+        fn, desc = selected
         # confirm with user
         resp = QMessageBox.question(
             self, "Apply Patch",
@@ -110,8 +468,7 @@ class GuiMainWindow(QMainWindow):
                 _propose_and_save_patch(fn, desc)
                 QMessageBox.information(self, "Patch Applied", f"Applied patch to {fn}")
                 # remove from list
-                completed_tasks[:] = [(f,d) for f,d in completed_tasks if not (f==fn and d==desc)]
-                self.refresh_patches()
+                remove_patch(fn, desc)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to apply patch: {e}")
 
@@ -119,20 +476,28 @@ class GuiMainWindow(QMainWindow):
         """
         Decline (remove) the selected patch.
         """
-        item = self.patch_list.currentItem()
-        if not item:
+        selected = self._selected_patch()
+        if not selected:
             return
-        text = item.text()
-        fn, desc = text.split(":", 1)
-        fn = fn.strip()
-        desc = desc.strip()
-        # remove from completed_tasks
-        before = len(completed_tasks)
-        completed_tasks[:] = [(f,d) for f,d in completed_tasks if not (f==fn and d==desc)]
-        after = len(completed_tasks)
-        if before != after:
+        fn, desc = selected
+        if remove_patch(fn, desc):
             QMessageBox.information(self, "Patch Declined", f"Declined patch for {fn}")
-            self.refresh_patches()
+
+    def on_cancel_task(self):
+        """
+        Cancel the selected background task if it hasn't finished.
+        """
+        index = self.task_list.currentIndex()
+        if not index.isValid():
+            return
+        task_id = self.task_model.data(index, Qt.UserRole)
+        if not background_tasks.cancel(task_id):
+            QMessageBox.information(self, "Cancel Task", f"Task #{task_id} has already finished.")
+
+    def closeEvent(self, event):
+        self.task_model.close()
+        self.patch_model.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
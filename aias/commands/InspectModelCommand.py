@@ -1,10 +1,24 @@
+import pickle
 import torch
 from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# Percentiles reported by `inspect model hist`
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# torch.quantile rejects larger inputs; bigger tensors are strided down to this
+QUANTILE_MAX_ELEMS = 1 << 24
 
 class InspectModelCommand:
     """
     Load the latest DQN model checkpoint and report per‐layer
     parameter statistics (mean, std, shape).
+    Checkpoints are memory-mapped (or read lazily from .safetensors), so
+    tensors are paged in one at a time rather than loaded up front.
+
+    Usage (args string):
+      ""             → mean/std/shape per layer
+      "hist"         → additionally a percentile histogram per layer
+      "diff A B"     → per-layer parameter drift from checkpoint A to B
     """
 
     def __init__(self, model_path: str = None):
@@ -15,15 +29,102 @@ class InspectModelCommand:
             self.model_path = Path(__file__).parents[1] / "models" / "dqn_model.pth"
 
     def execute(self, args=None) -> str:
+        parts = (args or "").split()
+        if parts and parts[0] == "diff":
+            if len(parts) != 3:
+                return "❌ Usage: diff <checkpoint A> <checkpoint B>"
+            return self.diff(Path(parts[1]), Path(parts[2]))
+
         if not self.model_path.exists():
             return f"❌ Model not found at {self.model_path}"
 
+        with_hist = "hist" in parts
         stats = []
-        ckpt = torch.load(self.model_path, map_location="cpu")
-        for name, tensor in ckpt.items():
-            m = float(tensor.mean().item())
-            s = float(tensor.std().item())
+        for name, tensor in _iter_tensors(self.model_path):
+            t = tensor.float()
+            m = float(t.mean().item())
+            s = float(t.std().item()) if t.numel() > 1 else 0.0
             shp = tuple(tensor.shape)
             stats.append(f"{name} → shape={shp}, mean={m:.4f}, std={s:.4f}")
+            if with_hist:
+                stats.append("    " + _format_percentiles(t))
 
         return "🔍 Model parameter stats:\n" + "\n".join(stats)
+
+    def diff(self, path_a: Path, path_b: Path) -> str:
+        """
+        Report per-layer drift between two checkpoints: L2 norm of the
+        change, drift relative to A's norm, max absolute change and cosine
+        similarity. Layers are sorted by relative drift, largest first.
+        """
+        for p in (path_a, path_b):
+            if not p.exists():
+                return f"❌ Model not found at {p}"
+
+        a = _load_state_dict(path_a)
+        b = _load_state_dict(path_b)
+        rows: List[Tuple[float, str]] = []
+        notes: List[str] = []
+        for name in a.keys() & b.keys():
+            ta, tb = a[name], b[name]
+            if ta.shape != tb.shape:
+                notes.append(f"{name} → shape changed {tuple(ta.shape)} → {tuple(tb.shape)}")
+                continue
+            fa = ta.float().reshape(-1)
+            fb = tb.float().reshape(-1)
+            delta = fb - fa
+            l2 = float(torch.linalg.vector_norm(delta))
+            norm_a = float(torch.linalg.vector_norm(fa))
+            rel = l2 / norm_a if norm_a > 0 else float("inf") if l2 > 0 else 0.0
+            max_abs = float(delta.abs().max()) if delta.numel() else 0.0
+            cos = float(torch.nn.functional.cosine_similarity(fa, fb, dim=0)) if fa.numel() else 1.0
+            rows.append((rel, f"{name} → l2={l2:.4f}, rel={rel:.2%}, max|Δ|={max_abs:.4f}, cos={cos:.4f}"))
+
+        rows.sort(key=lambda r: r[0], reverse=True)
+        notes.extend(f"{n} → only in A" for n in sorted(a.keys() - b.keys()))
+        notes.extend(f"{n} → only in B" for n in sorted(b.keys() - a.keys()))
+
+        out = [f"🔍 Parameter drift {path_a.name} → {path_b.name}:"]
+        out.extend(line for _, line in rows)
+        out.extend(notes)
+        return "\n".join(out)
+
+def _load_state_dict(path: Path) -> Dict[str, torch.Tensor]:
+    """
+    Open a checkpoint without reading it all into RAM. safetensors files
+    and zip-format torch checkpoints are memory-mapped; older pickle-format
+    files fall back to a regular load. Training checkpoints (dqn_checkpoint,
+    sweep/best_dqn) keep the weights under "model" next to optimizer state
+    and metadata; those are unwrapped and anything that isn't a tensor is
+    skipped.
+    """
+    if path.suffix == ".safetensors":
+        from safetensors.torch import load_file
+        return load_file(str(path), device="cpu")
+    try:
+        obj = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except (TypeError, RuntimeError, pickle.UnpicklingError):
+        # torch < 2.1 has no mmap=, and legacy checkpoints can't be mapped
+        obj = torch.load(path, map_location="cpu")
+    if isinstance(obj, dict) and isinstance(obj.get("model"), dict):
+        obj = obj["model"]
+    if not isinstance(obj, dict):
+        return {}
+    return {name: t for name, t in obj.items() if isinstance(t, torch.Tensor)}
+
+def _iter_tensors(path: Path) -> Iterator[Tuple[str, torch.Tensor]]:
+    if path.suffix == ".safetensors":
+        from safetensors import safe_open
+        with safe_open(str(path), framework="pt", device="cpu") as f:
+            for name in f.keys():
+                yield name, f.get_tensor(name)
+        return
+    yield from _load_state_dict(path).items()
+
+def _format_percentiles(t: torch.Tensor) -> str:
+    flat = t.reshape(-1)
+    if flat.numel() > QUANTILE_MAX_ELEMS:
+        flat = flat[:: -(-flat.numel() // QUANTILE_MAX_ELEMS)]
+    qs = torch.tensor([p / 100 for p in PERCENTILES], dtype=flat.dtype)
+    values = torch.quantile(flat, qs).tolist()
+    return ", ".join(f"p{p}={v:.4f}" for p, v in zip(PERCENTILES, values))
@@ -46,7 +46,7 @@ class SelfImproveCommand:
             return "✅ All self-improvement suggestions have already been queued."
 
         # 4) Queue and record them
-        from aias.agent import background_tasks, resolve_path
+        from aias.agent import enqueue_patch, resolve_path
 
         queued: List[str] = []
         for insight in new_insights:
@@ -54,7 +54,7 @@ class SelfImproveCommand:
             m = re.search(r"`([^`]+\.py)`", insight)
             fn = m.group(1) if m else "agent.py"
             path = resolve_path(fn) or fn
-            background_tasks.put((path, insight))
+            enqueue_patch(path, insight, kind="reflect")
             queued.append(f"- [{path}] {insight}")
             history.add(insight)
 
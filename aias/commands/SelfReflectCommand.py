@@ -1,9 +1,64 @@
 # aias/commands/SelfReflectCommand.py
 
 import ast
+import json
 from pathlib import Path
 from radon.complexity import cc_visit
-from typing import List, Set, Tuple
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from aias.core import load_config
+from aias.utils.fswalk import DEFAULT_EXCLUDES, update_file_cache, walk_files
+
+CACHE_PATH = Path("memory/reflect_cache.json")
+# Bump when _analyze_source changes so stale results are discarded
+CACHE_VERSION = 1
+
+
+def _analyze_source(src: str) -> Dict[str, Any]:
+    """
+    Analyse one file's source. Module-level so it can run in a worker process.
+    """
+    result: Dict[str, Any] = {"hotspots": [], "todos": src.count("TODO"), "missing_hints": False}
+
+    # 1) Cyclomatic complexity
+    try:
+        for comp in cc_visit(src):
+            if comp.complexity >= 8:
+                result["hotspots"].append((comp.name, comp.complexity))
+    except Exception:
+        pass
+
+    # 2) Missing type hints
+    try:
+        tree = ast.parse(src)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                # if any arg or return annotation is missing
+                args_missing = any(arg.annotation is None for arg in node.args.args)
+                returns_missing = node.returns is None
+                if args_missing or returns_missing:
+                    result["missing_hints"] = True
+                    break
+    except Exception:
+        pass
+
+    return result
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        cache = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, json.JSONDecodeError):
+        pass
+    return {"version": CACHE_VERSION, "files": {}}
+
+
+def _save_cache(cache: Dict[str, Any]) -> None:
+    CACHE_PATH.parent.mkdir(exist_ok=True)
+    tmp = CACHE_PATH.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache), encoding="utf-8")
+    tmp.replace(CACHE_PATH)
 
 
 class SelfReflectCommand:
@@ -18,11 +73,21 @@ class SelfReflectCommand:
         # Root of the project (two levels up from this file)
         self.project_root = Path(__file__).parents[2]
 
+        cfg = load_config().get("reflect", {}) or {}
+        self.exclude = cfg.get("exclude", DEFAULT_EXCLUDES)
+        self.respect_gitignore = cfg.get("respect_gitignore", True)
+
     def execute(self) -> str:
         """
         Run the full analysis and return a bullet-list of three insights.
         """
-        py_files = list(self.project_root.rglob("*.py"))
+        # Excluded trees are pruned before descent; files stream in as found
+        py_files = walk_files(
+            self.project_root,
+            suffixes=(".py",),
+            exclude=self.exclude,
+            respect_gitignore=self.respect_gitignore,
+        )
         hotspots, todo_counts, missing_hints = self._analyze_code(py_files)
         insights = self._build_insights(hotspots, todo_counts, missing_hints)
 
@@ -30,61 +95,35 @@ class SelfReflectCommand:
         return header + "\n" + "\n".join(insights)
 
     def _analyze_code(
-        self, py_files: List[Path]
+        self, py_files: Iterable[Path]
     ) -> Tuple[List[Tuple[str, str, int]], List[Tuple[str, int]], Set[str]]:
         """
         Scan each Python file for:
           - Cyclomatic complexity (collect those ≥ 8)
           - TODO comment counts
           - Missing type hints in function definitions
+        Per-file results are cached on disk by content hash; only new or
+        changed files are re-analysed, on a process pool when there are many.
         Returns three structures: hotspots, todo_counts, missing_hint_files.
         """
+        cache = _load_cache()
+        fresh, _ = update_file_cache(self.project_root, py_files, cache["files"], _analyze_source)
+
+        # Only keep entries for files that still exist
+        cache["files"] = fresh
+        _save_cache(cache)
+
         hotspots: List[Tuple[str, str, int]] = []
         todo_counts: List[Tuple[str, int]] = []
         missing_hint_files: Set[str] = set()
-
-        for f in py_files:
-            # Skip virtualenv, site-packages, hidden dirs
-            if (
-                "venv" in f.parts
-                or "site-packages" in f.parts
-                or f.name.startswith(".")
-            ):
-                continue
-
-            try:
-                src = f.read_text(encoding="utf-8", errors="ignore")
-            except Exception:
-                continue
-
-            rel_path = str(f.relative_to(self.project_root))
-
-            # 1) Cyclomatic complexity
-            try:
-                for comp in cc_visit(src):
-                    if comp.complexity >= 8:
-                        hotspots.append((rel_path, comp.name, comp.complexity))
-            except Exception:
-                pass
-
-            # 2) TODO comment count
-            count = src.count("TODO")
-            if count:
-                todo_counts.append((rel_path, count))
-
-            # 3) Missing type hints
-            try:
-                tree = ast.parse(src)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.FunctionDef):
-                        # if any arg or return annotation is missing
-                        args_missing = any(arg.annotation is None for arg in node.args.args)
-                        returns_missing = node.returns is None
-                        if args_missing or returns_missing:
-                            missing_hint_files.add(rel_path)
-                            break
-            except Exception:
-                pass
+        for rel_path, entry in fresh.items():
+            result = entry["result"]
+            for name, complexity in result["hotspots"]:
+                hotspots.append((rel_path, name, complexity))
+            if result["todos"]:
+                todo_counts.append((rel_path, result["todos"]))
+            if result["missing_hints"]:
+                missing_hint_files.add(rel_path)
 
         # Sort so the “worst” offenders are first
         hotspots.sort(key=lambda x: x[2], reverse=True)
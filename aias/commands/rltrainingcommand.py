@@ -1,13 +1,191 @@
 import os
+import csv
+import copy
 import json
+import math
+import time
+import queue
 import random
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import yaml
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from pathlib import Path
-from typing import Any, Dict, List
-from aias.envs.procedural_conversation_env import ProceduralConversationEnv
+from typing import Any, Dict, List, Optional, Tuple
+from aias.envs.procedural_conversation_env import STATE_LAYOUT, ProceduralConversationEnv
+
+class DQN(nn.Module):
+    """
+    Q-network over [user, ai] sentence embeddings; one output per candidate
+    response. Module-level so the serving router can rebuild it.
+    """
+    def __init__(self, s, a):
+        super().__init__()
+        self.net = nn.Sequential(
+            nn.Linear(s, 128),
+            nn.ReLU(),
+            nn.Linear(128, 64),
+            nn.ReLU(),
+            nn.Linear(64, a),
+        )
+    def forward(self, x):
+        return self.net(x)
+
+def _td_update(model: nn.Module, opt: optim.Optimizer, loss_fn: nn.Module, gamma: float,
+               states, actions, rewards, next_states, dones) -> float:
+    """
+    One Q-learning step on a mini-batch; returns the loss.
+    """
+    q_vals = model(states)
+    q_sel  = q_vals.gather(1, actions.unsqueeze(1)).squeeze(1)
+
+    with torch.no_grad():
+        next_q = model(next_states).max(1).values
+        targets = rewards + gamma * next_q * (1 - dones)
+
+    loss = loss_fn(q_sel, targets)
+    opt.zero_grad()
+    loss.backward()
+    opt.step()
+    return loss.item()
+
+class _AsyncCheckpointer:
+    """
+    Writes checkpoints from a background thread so training never waits on
+    disk I/O. Each write goes to a temp file that is fsynced and atomically
+    renamed over the target, so a crash mid-write leaves the previous
+    checkpoint intact. If a write is still running when the next snapshot
+    arrives, only the newest pending snapshot is kept.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._pending: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="rl-checkpointer", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: Dict[str, Any]) -> None:
+        try:
+            self._pending.get_nowait()   # drop a superseded snapshot
+        except queue.Empty:
+            pass
+        self._pending.put(snapshot)
+
+    def close(self) -> None:
+        """Flush the last pending snapshot and stop the writer."""
+        self._pending.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            snapshot = self._pending.get()
+            if snapshot is None:
+                break
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    torch.save(snapshot, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print(f"⚠️ Checkpoint write failed: {e}")
+
+# ─── Sweep workers ───────────────────────────────────────────────────────────
+# Each worker process maps the precomputed embeddings read-only, so the
+# dataset sits in the page cache once however many trials run in parallel.
+
+_sweep_data: Dict[str, Any] = {}
+
+def _sweep_init(data_path: str, ai_ids: List[int], threads: int) -> None:
+    torch.set_num_threads(threads)
+    _sweep_data["emb"] = np.load(data_path, mmap_mode="r")   # (2, N, d): user, ai
+    _sweep_data["ai_ids"] = ai_ids
+
+def _sweep_state(user_idx: int, ai_idx: int) -> np.ndarray:
+    emb = _sweep_data["emb"]
+    return np.concatenate((emb[0, user_idx], emb[1, ai_idx]))
+
+def _sweep_trial(trial: int, params: Dict[str, Any], episodes: int, seed: int,
+                 replay_size: int = 10000) -> Dict[str, Any]:
+    """
+    Train one DQN with `params` on the shared embeddings. Same episode and
+    reward rules as ProceduralConversationEnv, with an in-memory replay
+    buffer so trials never share the on-disk one.
+    """
+    start = time.perf_counter()
+    random.seed(seed)
+    torch.manual_seed(seed)
+    ai_ids = _sweep_data["ai_ids"]
+    n, dim = _sweep_data["emb"].shape[1:]
+
+    model = DQN(2 * dim, n)
+    opt = optim.Adam(model.parameters(), lr=params["learning_rate"])
+    loss_fn = nn.MSELoss()
+    replay: deque = deque(maxlen=replay_size)
+    eps_start, eps_end = params["epsilon_start"], params["epsilon_end"]
+    window = max(1, episodes // 10)
+    losses: deque = deque(maxlen=window)
+    rewards: deque = deque(maxlen=window)
+
+    for ep in range(1, episodes + 1):
+        idx = random.randrange(n)
+        state = _sweep_state(idx, idx - 1)
+        eps = max(eps_end, eps_start - (eps_start - eps_end) * (ep / episodes))
+        if random.random() < eps:
+            action = random.randrange(n)
+        else:
+            with torch.no_grad():
+                action = torch.argmax(model(torch.from_numpy(state))).item()
+
+        nxt = (idx + 1) % n
+        reward = 1.0 if ai_ids[action] == ai_ids[idx] else -0.5
+        replay.append((state, action, reward, _sweep_state(nxt, action), 1.0))
+        rewards.append(reward)
+
+        batch = random.sample(replay, min(params["batch_size"], len(replay)))
+        s_b, a_b, r_b, n_b, d_b = zip(*batch)
+        losses.append(_td_update(
+            model, opt, loss_fn, params["discount_factor"],
+            torch.from_numpy(np.stack(s_b)),
+            torch.tensor(a_b, dtype=torch.int64),
+            torch.tensor(r_b, dtype=torch.float32),
+            torch.from_numpy(np.stack(n_b)),
+            torch.tensor(d_b, dtype=torch.float32),
+        ))
+
+    return {
+        "trial":       trial,
+        "params":      params,
+        "final_loss":  sum(losses) / len(losses),
+        "mean_reward": sum(rewards) / len(rewards),
+        "wall_time":   time.perf_counter() - start,
+        "model":       model.state_dict(),
+    }
+
+def _response_pool(env: ProceduralConversationEnv) -> Dict[str, Any]:
+    # Action i means "reply with responses[i]" for states in this layout
+    return {"state_layout": STATE_LAYOUT, "responses": env.ai_msgs}
+
+def _sample_param(spec: Any, rng: random.Random) -> Any:
+    """
+    A list is sampled uniformly; {"min", "max", "log"} draws from a range.
+    """
+    if isinstance(spec, dict):
+        lo, hi = spec["min"], spec["max"]
+        if spec.get("log"):
+            return math.exp(rng.uniform(math.log(lo), math.log(hi)))
+        value = rng.uniform(lo, hi)
+        return int(round(value)) if isinstance(lo, int) and isinstance(hi, int) else value
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    return spec
 
 class RLTrainingCommand:
     """
@@ -27,30 +205,28 @@ class RLTrainingCommand:
         self.batch_size   = cfg.get("batch_size", 16)
         self.epsilon_start= cfg.get("epsilon_start", 0.3)
         self.epsilon_end  = cfg.get("epsilon_end", 0.05)
+        self.ckpt_every   = cfg.get("checkpoint_every", 100)
+        self.sweep_conf   = cfg.get("sweep", {}) or {}
+        # Optional time-window stratification of the sampled logs ("day", "week", seconds)
+        self.sample_window= cfg.get("sample_window")
 
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model  = None
         self.opt    = None
+        self.env    = None
         self.loss_fn= nn.MSELoss()
 
         # Replay buffer path
         self.replay_path = Path("memory/experience_replay.jsonl")
         self.replay_path.parent.mkdir(exist_ok=True, parents=True)
 
-    def _build_model(self, s_dim: int, a_dim: int):
-        class DQN(nn.Module):
-            def __init__(self, s, a):
-                super().__init__()
-                self.net = nn.Sequential(
-                    nn.Linear(s, 128),
-                    nn.ReLU(),
-                    nn.Linear(128, 64),
-                    nn.ReLU(),
-                    nn.Linear(64, a),
-                )
-            def forward(self, x):
-                return self.net(x)
+        # Periodic checkpoint (model, optimizer, replay position, ε schedule)
+        self.ckpt_path = Path(cfg.get(
+            "checkpoint_path",
+            Path(__file__).parents[1] / "models" / "dqn_checkpoint.pth"
+        ))
 
+    def _build_model(self, s_dim: int, a_dim: int):
         self.model = DQN(s_dim, a_dim).to(self.device)
         self.opt   = optim.Adam(self.model.parameters(), lr=self.lr)
 
@@ -59,18 +235,103 @@ class RLTrainingCommand:
         buffer = [json.loads(l) for l in lines]
         return random.sample(buffer, min(self.batch_size, len(buffer)))
 
+    def _snapshot(self, ep: int, env: ProceduralConversationEnv) -> Dict[str, Any]:
+        """
+        Copy everything needed to resume after episode `ep` onto the CPU.
+        This is the only part done on the training thread; serialising and
+        writing happen in the background.
+        """
+        return {
+            "episode":      ep,
+            "model":        {k: v.detach().to("cpu", copy=True) for k, v in self.model.state_dict().items()},
+            "optimizer":    copy.deepcopy(self.opt.state_dict()),
+            "replay_offset": self.replay_path.stat().st_size if self.replay_path.exists() else 0,
+            "epsilon":      {"start": self.epsilon_start, "end": self.epsilon_end, "max_eps": self.max_eps},
+            "dims":         (env.state_size, env.action_size),
+            "state_layout": STATE_LAYOUT,
+            "sample":       list(env.sample),
+            "rng":          {"python": random.getstate(), "torch": torch.get_rng_state()},
+        }
+
+    def _restore(self, env: ProceduralConversationEnv) -> int:
+        """
+        Load the last checkpoint into the model, optimizer and environment.
+        Returns the episode to continue from, or 1 if there is nothing to resume.
+        """
+        if not self.ckpt_path.exists():
+            print(f"⚠️ No checkpoint at {self.ckpt_path}; starting fresh.")
+            return 1
+        ckpt = torch.load(self.ckpt_path, map_location="cpu", weights_only=False)
+        if ckpt.get("state_layout") != STATE_LAYOUT:
+            print(f"⚠️ Checkpoint at {self.ckpt_path} uses an older state layout; starting fresh.")
+            return 1
+
+        # Restore the response pool first so action indices mean the same thing
+        env.sample   = ckpt["sample"]
+        env.user_msgs = [u for u,_ in env.sample]
+        env.ai_msgs   = [a for _,a in env.sample]
+        s_dim, a_dim = ckpt["dims"]
+        self._build_model(s_dim, a_dim)
+        self.model.load_state_dict(ckpt["model"])
+        self.opt.load_state_dict(ckpt["optimizer"])
+
+        # max_eps stays as configured, so raising max_iterations extends a finished run
+        sched = ckpt["epsilon"]
+        self.epsilon_start = sched["start"]
+        self.epsilon_end   = sched["end"]
+        random.setstate(ckpt["rng"]["python"])
+        torch.set_rng_state(ckpt["rng"]["torch"])
+
+        # Drop transitions logged after the checkpoint was taken
+        if self.replay_path.exists() and self.replay_path.stat().st_size > ckpt["replay_offset"]:
+            with open(self.replay_path, "r+b") as f:
+                f.truncate(ckpt["replay_offset"])
+
+        print(f"⏩ Resuming from episode {ckpt['episode']} ({self.ckpt_path})")
+        if ckpt["episode"] >= self.max_eps:
+            print(f"⚠️ max_iterations is {self.max_eps}; raise it in config.yaml to train further.")
+        return ckpt["episode"] + 1
+
     def execute(self, args: Any = None) -> None:
+        """
+        Train the DQN. Pass args="resume" to continue from the last periodic
+        checkpoint instead of starting over, or args="sweep" to run the
+        hyperparameter sweep from the `sweep` config section.
+        """
+        if args and "sweep" in str(args):
+            self.sweep()
+            return
+
         # Instantiate the procedural environment
         env = ProceduralConversationEnv(
             logs_path="memory/logs.jsonl",
             embed_model_name="all-MiniLM-L6-v2",
-            sample_size=200
+            sample_size=200,
+            stratify_window=self.sample_window
         )
-        s_dim, a_dim = env.state_size, env.action_size
-        self._build_model(s_dim, a_dim)
+        self.env = env
+        start_ep = 1
+        if args and "resume" in str(args):
+            start_ep = self._restore(env)
+        if self.model is None:
+            s_dim, a_dim = env.state_size, env.action_size
+            self._build_model(s_dim, a_dim)
+        a_dim = env.action_size
+
+        self.ckpt_path.parent.mkdir(exist_ok=True, parents=True)
+        checkpointer = _AsyncCheckpointer(self.ckpt_path)
 
         print(f"🔄 Starting RL training for {self.max_eps} episodes on {self.device}")
-        for ep in range(1, self.max_eps + 1):
+        try:
+            self._train(env, a_dim, start_ep, checkpointer)
+        finally:
+            checkpointer.close()
+
+        print("✅ Training complete.")
+
+    def _train(self, env: ProceduralConversationEnv, a_dim: int, start_ep: int,
+               checkpointer: _AsyncCheckpointer) -> None:
+        for ep in range(start_ep, self.max_eps + 1):
             state = env.reset().to(self.device)
             done = False
             transitions: List[Dict] = []
@@ -119,23 +380,120 @@ class RLTrainingCommand:
                 next_states = torch.tensor([d["next_state"]for d in batch], dtype=torch.float32, device=self.device)
                 dones       = torch.tensor([d["done"]      for d in batch], dtype=torch.float32, device=self.device)
 
-                q_vals = self.model(states)
-                q_sel  = q_vals.gather(1, actions.unsqueeze(1)).squeeze(1)
-
-                with torch.no_grad():
-                    next_q = self.model(next_states).max(1).values
-                    targets = rewards + self.gamma * next_q * (1 - dones)
-
-                loss = self.loss_fn(q_sel, targets)
-                self.opt.zero_grad()
-                loss.backward()
-                self.opt.step()
-                episode_loss = loss.item()
+                episode_loss = _td_update(self.model, self.opt, self.loss_fn, self.gamma,
+                                          states, actions, rewards, next_states, dones)
 
             if ep % 100 == 0:
                 print(f"Episode {ep}/{self.max_eps}, loss={episode_loss:.4f}, ε={eps:.3f}")
 
-        print("✅ Training complete.")
+            if self.ckpt_every and ep % self.ckpt_every == 0:
+                checkpointer.submit(self._snapshot(ep, env))
+
+    # ─── Hyperparameter sweep ────────────────────────────────────────────
+
+    def _sweep_configs(self) -> List[Dict[str, Any]]:
+        """
+        Expand `sweep.space` into trial configs: every combination in "grid"
+        mode, `sweep.trials` random draws in "random" mode. Parameters not
+        in the space keep their single-run values.
+        """
+        conf = self.sweep_conf
+        base = {
+            "learning_rate":   self.lr,
+            "discount_factor": self.gamma,
+            "batch_size":      self.batch_size,
+            "epsilon_start":   self.epsilon_start,
+            "epsilon_end":     self.epsilon_end,
+        }
+        space = conf.get("space", {}) or {}
+        if conf.get("mode", "grid") == "random":
+            rng = random.Random(conf.get("seed", 0))
+            return [
+                {**base, **{k: _sample_param(v, rng) for k, v in space.items()}}
+                for _ in range(conf.get("trials", 16))
+            ]
+        keys = list(space)
+        values = [v if isinstance(v, list) else [v] for v in space.values()]
+        return [{**base, **dict(zip(keys, combo))} for combo in itertools.product(*values)]
+
+    def sweep(self) -> Optional[Dict[str, Any]]:
+        """
+        Train one DQN per config on a process pool and write
+        models/sweep/results.csv (one row per trial, as trials finish).
+        The best trial by mean reward over its last 10% of episodes (lower
+        loss breaks ties) is saved to models/sweep/best_dqn.pth with its
+        config and response pool. Returns that trial's row.
+        """
+        conf     = self.sweep_conf
+        episodes = conf.get("episodes", self.max_eps)
+        workers  = conf.get("workers", max(1, (os.cpu_count() or 2) // 2))
+        threads  = conf.get("threads_per_worker", max(1, (os.cpu_count() or 1) // workers))
+        seed     = conf.get("seed", 0)
+        out_dir  = Path(__file__).parents[1] / "models" / "sweep"
+        out_dir.mkdir(exist_ok=True, parents=True)
+
+        env = ProceduralConversationEnv(
+            logs_path="memory/logs.jsonl",
+            embed_model_name="all-MiniLM-L6-v2",
+            sample_size=200,
+            stratify_window=self.sample_window
+        )
+        self.env = env
+
+        # Embed the sample once; every worker maps the same file read-only
+        print("🧮 Precomputing embeddings for the sweep...")
+        user = env.encoder.encode(env.user_msgs, convert_to_numpy=True)
+        ai   = env.encoder.encode(env.ai_msgs, convert_to_numpy=True)
+        data_path = out_dir / "embeddings.npy"
+        np.save(data_path, np.stack((user, ai)).astype(np.float32))
+        first_seen: Dict[str, int] = {}
+        ai_ids = [first_seen.setdefault(a, i) for i, a in enumerate(env.ai_msgs)]
+
+        configs = self._sweep_configs()
+        names = list(configs[0]) if configs else []
+        results_path = out_dir / "results.csv"
+        print(f"🔬 Sweeping {len(configs)} configs x {episodes} episodes on {workers} workers "
+              f"({threads} torch thread(s) each)")
+
+        best: Optional[Dict[str, Any]] = None
+        ctx = multiprocessing.get_context("spawn")   # forking a process that already runs torch threads can hang
+        with open(results_path, "w", newline="", encoding="utf-8") as f, \
+             ProcessPoolExecutor(workers, mp_context=ctx, initializer=_sweep_init,
+                                 initargs=(str(data_path), ai_ids, threads)) as pool:
+            writer = csv.writer(f)
+            writer.writerow(["trial", *names, "final_loss", "mean_reward", "wall_time_s"])
+            futures = [pool.submit(_sweep_trial, i, cfg, episodes, seed + i)
+                       for i, cfg in enumerate(configs)]
+            for fut in as_completed(futures):
+                res = fut.result()
+                writer.writerow([res["trial"], *(res["params"][k] for k in names),
+                                 f"{res['final_loss']:.6f}", f"{res['mean_reward']:.4f}",
+                                 f"{res['wall_time']:.2f}"])
+                f.flush()
+                print(f"  trial {res['trial']}: reward={res['mean_reward']:.3f} "
+                      f"loss={res['final_loss']:.4f} ({res['wall_time']:.1f}s)")
+                if best is None or (res["mean_reward"], -res["final_loss"]) > \
+                        (best["mean_reward"], -best["final_loss"]):
+                    best = res
+
+        if best is None:
+            print("⚠️ Sweep space is empty; nothing was trained.")
+            return None
+
+        best_path = out_dir / "best_dqn.pth"
+        torch.save({
+            "model":   best["model"],
+            "dims":    (env.state_size, env.action_size),
+            "state_layout": STATE_LAYOUT,
+            "params":  best["params"],
+            "metrics": {k: best[k] for k in ("final_loss", "mean_reward", "wall_time")},
+            "sample":  list(env.sample),
+        }, best_path)
+        (out_dir / "best_responses.json").write_text(
+            json.dumps(_response_pool(env), ensure_ascii=False), encoding="utf-8")
+        print(f"📊 Results written to {results_path}")
+        print(f"🏆 Best trial {best['trial']} {best['params']} saved to {best_path}")
+        return {k: v for k, v in best.items() if k != "model"}
 
     def clean_up(self, args: Any = None) -> None:
         out_dir = Path(__file__).parents[1] / "models"
@@ -143,3 +501,9 @@ class RLTrainingCommand:
         save_path = out_dir / "dqn_model.pth"
         torch.save(self.model.state_dict(), save_path)
         print(f"💾 Model saved to {save_path}")
+
+        # Action i means "reply with ai_msgs[i]"; the router needs the same pool
+        if self.env is not None:
+            pool_path = out_dir / "dqn_responses.json"
+            pool_path.write_text(json.dumps(_response_pool(self.env), ensure_ascii=False), encoding="utf-8")
+            print(f"💾 Response pool saved to {pool_path}")
@@ -1,33 +1,175 @@
+import hashlib
 import os
-import pyautogui
+import threading
+import time
 from datetime import datetime
+
 from PIL import Image
 import pytesseract
 
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+if os.name == "nt":
+	pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+BAND_HEIGHT = 64   # rows per tile; tiles are full-width so text lines stay whole
+MAX_REGION_BANDS = 4   # longest run of bands read in one tesseract call
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def _screen_conf():
+	from aias.core import load_config
+	return load_config().get("screen_awareness", {}) or {}
+
+
+def grab_screen():
+	"""
+	Screenshot as an in-memory PIL image; nothing touches the disk.
+	"""
+	import pyautogui
+	return pyautogui.screenshot()
 
-def capture_screenshot(save_path=None):
+
+def capture_screenshot(save_path=None, image=None):
 	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 	filename = f"screenshot_{timestamp}.png"
 	folder = "memory/screenshots"
 	os.makedirs(folder, exist_ok=True)
 
 	path = save_path or os.path.join(folder, filename)
-	image = pyautogui.screenshot()
+	image = image or grab_screen()
 	image.save(path)
 
 	print(f"📸 Screenshot saved to {path}")
 	return path
 
 
+class IncrementalOCR:
+	"""
+	OCR that only re-reads what changed since the last frame.
+
+	Each frame is cut into full-width bands of `band_height` rows and every
+	band is hashed from its raw pixels. A frame whose hashes all match the
+	previous one is answered from cache without calling tesseract. Otherwise
+	adjacent changed bands are merged into one region and only those regions
+	are OCR'd; the text of untouched regions is reused.
+
+	Regions, not single bands, are what get cached: once bands 3-5 were read
+	together their text can't be split back per band, so a change in band 4
+	re-reads 3-5; runs are capped at `max_region_bands` so one full-screen
+	change doesn't turn every later edit into a full re-read. A line of
+	text straddling a band edge is read with the region it falls in, the
+	same trade-off a full-frame OCR never has to make.
+	"""
+
+	def __init__(self, band_height=BAND_HEIGHT, ocr=None, max_region_bands=MAX_REGION_BANDS):
+		self.band_height = band_height
+		self.max_region_bands = max_region_bands
+		self.ocr = ocr or pytesseract.image_to_string
+		self.size = None
+		self.hashes = []
+		self.regions = []   # [(first_band, last_band, text)], in screen order
+		self.text = ""
+		self.stats = {"frames": 0, "unchanged": 0, "bands": 0, "bands_ocrd": 0, "ocr_ms": 0.0}
+
+	def _band_hashes(self, img):
+		width, height = img.size
+		data = memoryview(img.tobytes())
+		stride = width * len(img.getbands())
+		hashes = []
+		for top in range(0, height, self.band_height):
+			bottom = min(top + self.band_height, height)
+			hashes.append(hashlib.blake2b(data[top * stride:bottom * stride], digest_size=16).digest())
+		return hashes
+
+	def _read(self, img, first, last):
+		top = first * self.band_height
+		bottom = min((last + 1) * self.band_height, img.size[1])
+		start = time.perf_counter()
+		text = self.ocr(img.crop((0, top, img.size[0], bottom))).strip()
+		self.stats["ocr_ms"] += (time.perf_counter() - start) * 1000
+		self.stats["bands_ocrd"] += last - first + 1
+		return text
+
+	def process(self, img):
+		"""
+		OCR one frame and return the full screen text.
+		"""
+		if img.mode not in ("RGB", "L"):
+			img = img.convert("RGB")
+		hashes = self._band_hashes(img)
+		self.stats["frames"] += 1
+		self.stats["bands"] += len(hashes)
+
+		if img.size != self.size:
+			changed = set(range(len(hashes)))
+			self.regions = []
+		else:
+			changed = {i for i, (a, b) in enumerate(zip(hashes, self.hashes)) if a != b}
+		if not changed:
+			self.stats["unchanged"] += 1
+			return self.text
+
+		# Every cached region touching a changed band has to be read again.
+		dirty = set(changed)
+		kept = []
+		for first, last, text in self.regions:
+			if any(i in changed for i in range(first, last + 1)):
+				dirty.update(range(first, last + 1))
+			else:
+				kept.append((first, last, text))
+
+		runs = []
+		for i in sorted(dirty):
+			if runs and runs[-1][1] == i - 1 and i - runs[-1][0] < self.max_region_bands:
+				runs[-1][1] = i
+			else:
+				runs.append([i, i])
+
+		fresh = [(first, last, self._read(img, first, last)) for first, last in runs]
+		# Only remember the frame once it was read, so a failed OCR retries.
+		self.size = img.size
+		self.hashes = hashes
+		self.regions = sorted(kept + fresh)
+		self.text = "\n".join(text for _, _, text in self.regions if text)
+		return self.text
+
+	def reset(self):
+		self.size = None
+		self.hashes = []
+		self.regions = []
+		self.text = ""
+
+
+def get_reader():
+	global _reader
+	with _reader_lock:
+		if _reader is None:
+			_reader = IncrementalOCR(_screen_conf().get("ocr_band_height", BAND_HEIGHT))
+	return _reader
+
+
 def read_screen_text():
 	print("🔍 Taking screenshot for OCR...")
-	path = capture_screenshot()
-	img = Image.open(path)
+	img = grab_screen()
+	if _screen_conf().get("log_screenshots"):
+		capture_screenshot(image=img)
 
 	try:
-		text = pytesseract.image_to_string(img)
-		return text.strip()
+		reader = get_reader()
+		with _reader_lock:
+			return reader.process(img)
 	except Exception as e:
 		print(f"❌ OCR failed: {e}")
 		return ""
+
+
+def read_image_sequence(paths, reader=None):
+	"""
+	Run OCR over saved frames in order, as if each were a fresh screenshot.
+	Yields (path, text) pairs; for headless runs and benchmarks.
+	"""
+	reader = reader or IncrementalOCR()
+	for path in paths:
+		with Image.open(path) as img:
+			yield str(path), reader.process(img)
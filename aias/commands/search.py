@@ -1,25 +1,122 @@
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from bs4 import BeautifulSoup
 
+from aias.commands.web import get_session
+from aias.core import SingleFlight, load_config
+
+DEFAULT_ENDPOINT = "https://html.duckduckgo.com/html/"
+CACHE_TTL = 600          # seconds a parsed result page stays valid
+CACHE_MAX_ENTRIES = 512
+
+try:
+	import lxml  # noqa: F401
+	_PARSER = "lxml"
+except ImportError:
+	_PARSER = "html.parser"
+
+# (endpoint, normalized query) → (expires_at, results)
+_cache = {}
+_cache_lock = threading.Lock()
+# concurrent misses for the same query share one request
+_flights = SingleFlight()
+
+
+def _search_conf():
+	return load_config().get("search", {}) or {}
+
+
+def normalize_query(query):
+	return " ".join(query.lower().split())
+
+
+def parse_results(html, max_results=10):
+	"""
+	Extract [{"title", "url", "snippet"}] from a DuckDuckGo HTML result page;
+	every result on the page if `max_results` is None.
+	"""
+	soup = BeautifulSoup(html, _PARSER)
+	results = []
+	for link in soup.find_all("a", {"class": "result__a"}):
+		container = link.find_parent("div", {"class": "result"})
+		snippet = container.find(class_="result__snippet") if container else None
+		results.append({
+			"title": link.text.strip(),
+			"url": link.get("href", ""),
+			"snippet": snippet.text.strip() if snippet else "",
+		})
+		if max_results is not None and len(results) >= max_results:
+			break
+	return results
+
+
+def search(query, max_results=10, endpoint=None, ttl=None, session=None):
+	"""
+	Run one query and return structured results. Parsed pages are cached by
+	normalized query for `ttl` seconds. `endpoint` defaults to
+	search.endpoint in config.yaml, so a local stub can stand in for
+	DuckDuckGo in tests and benchmarks.
+	"""
+	conf = _search_conf()
+	endpoint = endpoint or conf.get("endpoint", DEFAULT_ENDPOINT)
+	ttl = conf.get("cache_ttl", CACHE_TTL) if ttl is None else ttl
+	key = (endpoint, normalize_query(query))
+
+	now = time.time()
+	with _cache_lock:
+		hit = _cache.get(key)
+		if hit and hit[0] > now:
+			return hit[1][:max_results]
+
+	def fetch():
+		res = (session or get_session()).get(endpoint, params={"q": key[1]}, timeout=10)
+		res.raise_for_status()
+		# The cache and in-flight followers share this list, and each caller
+		# slices its own max_results from it, so keep the whole page
+		results = parse_results(res.text, max_results=None)
+		with _cache_lock:
+			_cache[key] = (now + ttl, results)
+			if len(_cache) > CACHE_MAX_ENTRIES:
+				# drop the entry closest to expiry
+				del _cache[min(_cache, key=lambda k: _cache[k][0])]
+		return results
+
+	results, _ = _flights.do(repr(key), fetch)
+	return results[:max_results]
+
+
+def search_many(queries, max_workers=4, **kwargs):
+	"""
+	Run several queries concurrently. Returns {query: results}; a query
+	that failed maps to an empty list.
+	"""
+	def one(query):
+		try:
+			return search(query, **kwargs)
+		except Exception:
+			return []
+
+	with ThreadPoolExecutor(max_workers=max_workers) as pool:
+		return dict(zip(queries, pool.map(one, queries)))
+
+
 def search_google(query):
 	print(f"🔍 Searching: {query}")
-	url = f"https://html.duckduckgo.com/html/?q={query.replace(' ', '+')}"
-	headers = {
-		"User-Agent": "Mozilla/5.0"
-	}
 
 	try:
-		res = requests.get(url, headers=headers)
-		soup = BeautifulSoup(res.text, "html.parser")
-		results = soup.find_all("a", {"class": "result__a"})
+		results = search(query, max_results=5)
 
 		if not results:
 			print("❌ No results found.")
-			return
+			return []
 
 		print("📄 Top Results:")
-		for i, link in enumerate(results[:5], start=1):
-			print(f"{i}. {link.text.strip()}")
-			print(f"   {link['href']}")
+		for i, r in enumerate(results, start=1):
+			print(f"{i}. {r['title']}")
+			print(f"   {r['url']}")
+		return results
 	except Exception as e:
 		print(f"❌ Search failed: {e}")
+		return []
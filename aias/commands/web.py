@@ -1,15 +1,282 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def fetch_url(url):
+CACHE_DIR = "memory/http_cache"
+# The least recently used entries are evicted past either limit
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+# store() re-checks the limits after this many stores or bytes written, or
+# once this many seconds have passed since the last check
+SWEEP_EVERY_STORES = 100
+SWEEP_EVERY_BYTES = 20 * 1024 * 1024
+SWEEP_INTERVAL = 600
+MAX_BYTES = 5 * 1024 * 1024   # stop reading a body after this many bytes
+CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_session():
+	"""
+	Process-wide requests.Session, so connections to a host are pooled and reused.
+	"""
+	global _session
+	with _session_lock:
+		if _session is None:
+			s = requests.Session()
+			adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=1)
+			s.mount("http://", adapter)
+			s.mount("https://", adapter)
+			s.headers["User-Agent"] = "Mozilla/5.0"
+			_session = s
+	return _session
+
+
+def get_cache():
+	"""
+	Process-wide HttpCache over CACHE_DIR, so its sweep bookkeeping persists between fetches.
+	"""
+	global _cache
+	with _cache_lock:
+		if _cache is None:
+			_cache = HttpCache()
+	return _cache
+
+
+class HttpCache:
+	"""
+	Disk cache of response bodies with their validators. Each URL maps to
+	<sha256>.json (status, ETag, Last-Modified, expiry) and <sha256>.body.
+	A hit touches the .json file, so its mtime is the entry's last use.
+	Every so often (see SWEEP_EVERY_*), store() sweeps the directory and
+	evicts least recently used entries past the size limits; the first
+	store of a process always sweeps.
+	"""
+
+	def __init__(self, directory=CACHE_DIR, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+		self.directory = directory
+		self.max_entries = max_entries
+		self.max_bytes = max_bytes
+		self._lock = threading.Lock()
+		self._stores = 0           # since the last sweep
+		self._bytes = 0
+		self._swept_at = None      # time.monotonic() of the last sweep
+		os.makedirs(directory, exist_ok=True)
+
+	def _paths(self, url):
+		key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+		base = os.path.join(self.directory, key)
+		return base + ".json", base + ".body"
+
+	def load(self, url):
+		meta_path, body_path = self._paths(url)
+		try:
+			with open(meta_path, encoding="utf-8") as f:
+				meta = json.load(f)
+			with open(body_path, "rb") as f:
+				body = f.read()
+		except (OSError, json.JSONDecodeError):
+			return None
+		try:
+			os.utime(meta_path)
+		except OSError:
+			pass
+		return meta, body
+
+	def store(self, url, meta, body=None):
+		meta_path, body_path = self._paths(url)
+		if body is not None:
+			_write_atomic(body_path, body)
+		_write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+		with self._lock:
+			self._stores += 1
+			self._bytes += len(body or b"")
+			due = (self._swept_at is None
+				or self._stores >= SWEEP_EVERY_STORES
+				or self._bytes >= SWEEP_EVERY_BYTES
+				or time.monotonic() - self._swept_at >= SWEEP_INTERVAL)
+		if due:
+			self.sweep()
+
+	def sweep(self):
+		"""
+		Delete least recently used entries until the cache is within
+		max_entries and max_bytes. Returns how many entries were removed.
+		"""
+		with self._lock:
+			self._stores = self._bytes = 0
+			self._swept_at = time.monotonic()
+			entries = {}   # key -> [last used, bytes, paths]
+			try:
+				files = list(os.scandir(self.directory))
+			except OSError:
+				return 0
+			for entry in files:
+				key, ext = os.path.splitext(entry.name)
+				if ext not in (".json", ".body"):
+					continue
+				try:
+					st = entry.stat()
+				except OSError:
+					continue
+				e = entries.setdefault(key, [0.0, 0, []])
+				if ext == ".json" or not e[0]:
+					e[0] = st.st_mtime
+				e[1] += st.st_size
+				e[2].append(entry.path)
+
+			total = sum(e[1] for e in entries.values())
+			count = len(entries)
+			removed = 0
+			for used, size, paths in sorted(entries.values(), key=lambda e: e[0]):
+				if count <= self.max_entries and total <= self.max_bytes:
+					break
+				for path in paths:
+					try:
+						os.remove(path)
+					except OSError:
+						pass
+				count -= 1
+				total -= size
+				removed += 1
+			return removed
+
+
+def _write_atomic(path, data):
+	tmp = f"{path}.{threading.get_ident()}.tmp"
+	with open(tmp, "wb") as f:
+		f.write(data)
+	os.replace(tmp, path)
+
+
+def _expiry(headers, now):
+	"""
+	When a response stops being fresh, from Cache-Control max-age or
+	Expires. Returns None for no-store (don't cache) and `now` when it
+	must be revalidated before every use.
+	"""
+	cc = headers.get("Cache-Control", "").lower()
+	if "no-store" in cc:
+		return None
+	if "no-cache" in cc:
+		return now
+	m = re.search(r"max-age=(\d+)", cc)
+	if m:
+		return now + int(m.group(1))
+	if headers.get("Expires"):
+		try:
+			return parsedate_to_datetime(headers["Expires"]).timestamp()
+		except (TypeError, ValueError):
+			return now
+	return now
+
+
+def fetch(url, timeout=10, max_bytes=MAX_BYTES, cache=None, session=None):
+	"""
+	GET `url` through the disk cache. Fresh entries are returned without a
+	request; stale ones are revalidated with If-None-Match /
+	If-Modified-Since. Bodies are streamed and cut off at `max_bytes`.
+	Returns {"url", "status", "text", "from_cache", "truncated"}.
+	"""
 	if not url.startswith("http"):
 		url = "https://" + url
+	cache = cache or get_cache()
+	session = session or get_session()
+	now = time.time()
+
+	entry = cache.load(url)
+	if entry:
+		meta, body = entry
+		if meta.get("expires", 0) > now:
+			return _result(url, meta, body, from_cache=True)
+
+	headers = {}
+	if entry:
+		if meta.get("etag"):
+			headers["If-None-Match"] = meta["etag"]
+		if meta.get("last_modified"):
+			headers["If-Modified-Since"] = meta["last_modified"]
+
+	with session.get(url, headers=headers, timeout=timeout, stream=True) as resp:
+		if resp.status_code == 304 and entry:
+			expires = _expiry(resp.headers, now)
+			if expires is not None:
+				meta["expires"] = expires
+				cache.store(url, meta)
+			return _result(url, meta, body, from_cache=True)
+
+		chunks, size, truncated = [], 0, False
+		for chunk in resp.iter_content(CHUNK_SIZE):
+			if size + len(chunk) > max_bytes:
+				chunks.append(chunk[:max_bytes - size])
+				truncated = True
+				break
+			chunks.append(chunk)
+			size += len(chunk)
+		body = b"".join(chunks)
+
+		meta = {
+			"status": resp.status_code,
+			"encoding": resp.encoding or "utf-8",
+			"etag": resp.headers.get("ETag"),
+			"last_modified": resp.headers.get("Last-Modified"),
+		}
+		expires = _expiry(resp.headers, now)
+		if resp.status_code == 200 and expires is not None and not truncated:
+			meta["expires"] = expires
+			cache.store(url, meta, body)
 
+	result = _result(url, meta, body, from_cache=False)
+	result["truncated"] = truncated
+	return result
+
+
+def _result(url, meta, body, from_cache):
+	return {
+		"url": url,
+		"status": meta.get("status", 200),
+		"text": body.decode(meta.get("encoding") or "utf-8", errors="replace"),
+		"from_cache": from_cache,
+		"truncated": False,
+	}
+
+
+def fetch_urls(urls, max_workers=8, **kwargs):
+	"""
+	Fetch several URLs concurrently over the pooled session. Results are
+	in input order; a failed URL gets {"url", "error"} instead.
+	"""
+	def one(url):
+		try:
+			return fetch(url, **kwargs)
+		except Exception as e:
+			return {"url": url, "error": str(e)}
+
+	with ThreadPoolExecutor(max_workers=max_workers) as pool:
+		return list(pool.map(one, urls))
+
+
+def fetch_url(url):
 	try:
 		print(f"🌐 Fetching: {url}")
-		response = requests.get(url, timeout=10)
-		print(f"✅ Status: {response.status_code}")
-		print("📄 Response preview:\n", response.text[:1000])  # limit output
-		return response.text
+		result = fetch(url)
+		source = " (cached)" if result["from_cache"] else ""
+		print(f"✅ Status: {result['status']}{source}")
+		print("📄 Response preview:\n", result["text"][:1000])  # limit output
+		return result["text"]
 	except Exception as e:
 		print(f"❌ Failed to fetch: {e}")
 		return ""
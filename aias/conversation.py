@@ -0,0 +1,209 @@
+# aias/conversation.py
+
+"""
+Bounded conversation memory for chat prompts.
+
+The last few turns are kept verbatim; older turns are folded, a batch at a
+time, into a rolling LLM summary. Prompts are built as a stable prefix
+(header + summary), which only changes when a fold completes, followed by
+past turns recalled from long-term memory, the recent turns and the new
+message, all within a token budget.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Callable, Deque, List, Optional, Tuple
+
+# Turns kept verbatim, and how many of the oldest are folded at once
+KEEP_TURNS = 6
+FOLD_BATCH = 4
+# Token budgets for the conversation part of the prompt
+TOKEN_BUDGET = 1500
+SUMMARY_BUDGET = 300
+MEMORY_BUDGET = 400
+# LLM summaries cached by (previous summary, folded turns)
+SUMMARY_CACHE_SIZE = 256
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between Ricky and AIAS in at most {words} words. "
+    "Keep names, decisions, open tasks and file names; drop small talk.\n\n"
+    "Previous summary:\n{summary}\n\nNew turns:\n{turns}\n\nSummary:"
+)
+
+Turn = Tuple[str, str]
+
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+_summary_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Cheap token estimate (words and punctuation marks), cached per string.
+    Close enough to a BPE count for budgeting.
+    """
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def _truncate(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    words = text.split()
+    while words and count_tokens(" ".join(words)) > budget:
+        words = words[: max(len(words) * 3 // 4, len(words) - 50)]
+    return " ".join(words) + " …"
+
+
+def _format_turns(turns: List[Turn]) -> str:
+    return "\n".join(f"[User]: {u}\n[AIAS]: {a}" for u, a in turns)
+
+
+class ConversationContext:
+    """
+    Memory for one conversation. `summarize` is called with a prompt and
+    returns the summary text (defaults to core.ask_llm); folds run on a
+    background thread so replies are never held up by summarisation.
+    """
+
+    def __init__(self,
+                 keep_turns: int = KEEP_TURNS,
+                 token_budget: int = TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_BUDGET,
+                 summarize: Optional[Callable[[str], str]] = None):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self._summarize = summarize
+        self._lock = threading.Lock()
+        self._turns: Deque[Turn] = deque()
+        self._summary = ""
+        self._folding = False
+        self._prefix_cache = None
+
+    @property
+    def prefix_cache(self):
+        """
+        This conversation's core.PrefixCache, created on first use.
+        """
+        if self._prefix_cache is None:
+            from aias.core import PrefixCache
+            self._prefix_cache = PrefixCache()
+        return self._prefix_cache
+
+    @property
+    def last_reply(self) -> str:
+        """
+        The most recent AI reply still held verbatim, or "".
+        """
+        with self._lock:
+            return self._turns[-1][1] if self._turns else ""
+
+    @property
+    def summary(self) -> str:
+        with self._lock:
+            return self._summary
+
+    def add_turn(self, user: str, ai: str) -> None:
+        """
+        Record a finished exchange; start a fold if too many are verbatim.
+        """
+        with self._lock:
+            self._turns.append((user, ai))
+            if self._folding or len(self._turns) < self.keep_turns + FOLD_BATCH:
+                return
+            batch = [self._turns[i] for i in range(FOLD_BATCH)]
+            prev = self._summary
+            self._folding = True
+        threading.Thread(target=self._fold, args=(prev, batch), daemon=True).start()
+
+    def prompt_parts(self, header: str, user_text: str,
+                     memories: Optional[List[Turn]] = None) -> Tuple[str, str]:
+        """
+        Return (prefix, suffix). The prefix is `header` plus the rolling
+        summary and is reused verbatim across turns until the next fold;
+        the suffix holds recalled `memories` (best first, up to
+        MEMORY_BUDGET tokens, skipping turns still held verbatim), then as
+        many recent turns as fit the budget, then the new message.
+        """
+        with self._lock:
+            summary = self._summary
+            turns = list(self._turns)
+
+        prefix = header
+        if summary:
+            prefix += f"\nConversation so far (summary):\n{summary}\n"
+
+        tail = f"\n[User]: {user_text}\n[AIAS]:"
+        budget = self.token_budget - count_tokens(summary) - count_tokens(tail)
+
+        recalled: List[str] = []
+        memory_budget = min(MEMORY_BUDGET, budget // 2)
+        for u, a in memories or []:
+            if (u, a) in turns:
+                continue
+            block = f"\n- [User]: {u}\n  [AIAS]: {a}"
+            cost = count_tokens(block)
+            if cost > memory_budget:
+                continue
+            recalled.append(block)
+            memory_budget -= cost
+            budget -= cost
+        memory_part = ""
+        if recalled:
+            memory_part = "\nRelevant earlier conversations:" + "".join(recalled) + "\n"
+            budget -= count_tokens(memory_part) - sum(count_tokens(b) for b in recalled)
+        kept: List[str] = []
+        for u, a in reversed(turns):
+            block = f"\n[User]: {u}\n[AIAS]: {a}"
+            cost = count_tokens(block)
+            if cost > budget:
+                break
+            kept.append(block)
+            budget -= cost
+        return prefix, memory_part + "".join(reversed(kept)) + tail
+
+    def build_prompt(self, header: str, user_text: str,
+                     memories: Optional[List[Turn]] = None) -> str:
+        prefix, suffix = self.prompt_parts(header, user_text, memories)
+        return prefix + suffix
+
+    def _fold(self, prev: str, batch: List[Turn]) -> None:
+        try:
+            summary = self._summary_for(prev, batch)
+        except Exception:
+            summary = ""
+        if not summary:
+            # LLM unavailable: keep a clipped transcript instead
+            summary = (prev + "\n" if prev else "") + _format_turns(batch)
+        summary = _truncate(summary, self.summary_budget)
+        with self._lock:
+            self._summary = summary
+            for _ in batch:
+                self._turns.popleft()
+            self._folding = False
+
+    def _summary_for(self, prev: str, batch: List[Turn]) -> str:
+        key = hashlib.sha1(repr((prev, batch)).encode("utf-8")).hexdigest()
+        with _summary_lock:
+            if key in _summary_cache:
+                _summary_cache.move_to_end(key)
+                return _summary_cache[key]
+
+        summarize = self._summarize
+        if summarize is None:
+            from aias.core import ask_llm
+            summarize = ask_llm
+        words = max(20, self.summary_budget * 3 // 4)
+        summary = summarize(SUMMARY_PROMPT.format(
+            words=words, summary=prev or "(none)", turns=_format_turns(batch)
+        )).strip()
+
+        if summary:
+            with _summary_lock:
+                _summary_cache[key] = summary
+                while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+                    _summary_cache.popitem(last=False)
+        return summary
@@ -2,13 +2,17 @@
 
 import os
 import json
-import queue
+import hashlib
+import threading
+import time
 import requests
 import re
 import yaml
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from aias.scheduler import TaskScheduler
 
 # ─── Configuration ─────────────────────────────────────────────────────────────
 
@@ -30,21 +34,227 @@ OLLAMA_URL = _conf["ollama_url"]
 
 # ─── LLM Wrappers ─────────────────────────────────────────────────────────────
 
-def ask_llm(prompt: str) -> str:
+class LLMCancelled(Exception):
+    """
+    Raised from an `on_token` callback to abort a streaming generation.
+    Propagates out of ask_llm (and handle_input) instead of being swallowed.
+    """
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key: the first caller runs the
+    function, callers arriving while it is in flight wait and get the same
+    result (or exception). `collapsed` counts the calls that were saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return (result, shared) where shared is True if another caller's
+        in-flight call produced the result.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "collapsed": self.collapsed, "in_flight": len(self._flights)}
+
+# Identical generate requests in flight at the same time share one HTTP call
+llm_flights = SingleFlight()
+
+def _generate(payload: Dict[str, Any],
+              on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    POST `payload` to /api/generate and return the final response object,
+    with "response" holding the full text. Streams through `on_token` if
+    given. Raises on transport or decode errors.
+
+    Concurrent calls with an identical payload share one request (see
+    llm_flights). A caller that joins an in-flight request gets the whole
+    reply through `on_token` as one chunk once it is done; if the request it
+    joined was cancelled by its leader, it makes its own.
+    """
+    payload = {"model": MODEL, **payload}
+    key = hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    while True:
+        ran = []
+        def call() -> Dict[str, Any]:
+            ran.append(True)
+            return _post_generate(payload, on_token)
+        try:
+            data, shared = llm_flights.do(key, call)
+            break
+        except LLMCancelled:
+            # only our own on_token may cancel us; otherwise retry as leader
+            if ran:
+                raise
+    if shared:
+        data = dict(data)
+        if on_token is not None and data.get("response"):
+            on_token(data["response"])
+    return data
+
+def _post_generate(payload: Dict[str, Any],
+                   on_token: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+    payload = {**payload, "stream": on_token is not None}
+    resp = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, stream=on_token is not None)
+    if on_token is None:
+        return resp.json()
+
+    pieces: List[str] = []
+    data: Dict[str, Any] = {}
+    with resp:
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            chunk = data.get("response", "")
+            if chunk:
+                pieces.append(chunk)
+                on_token(chunk)
+            if data.get("done"):
+                break
+    data["response"] = "".join(pieces)
+    return data
+
+def ask_llm(prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     """
     Send a single-prompt generate request to Ollama.
+    If `on_token` is given, the reply is streamed and each chunk is passed
+    to it as it arrives.
     Returns the generated text, or empty string on error.
     """
     try:
-        resp = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={"model": MODEL, "prompt": prompt}
-        )
-        data = resp.json()
-        return data.get("response", "").strip()
+        return _generate({"prompt": prompt}, on_token).get("response", "").strip()
+    except LLMCancelled:
+        raise
     except Exception:
         return ""
 
+class PrefixCache:
+    """
+    Reuses Ollama's KV `context` for a prompt prefix that stays the same
+    across turns (persona, file listing, conversation summary).
+
+    The prefix is prefilled once with no tokens generated, and the returned
+    context is sent with each later request so only the suffix is
+    evaluated. Any change to the prefix (or model) invalidates it. Both
+    calls go through the model's prompt template, so a cached turn reaches
+    the model as a prefix turn followed by a suffix turn rather than one
+    message. If the server generated tokens while warming (an Ollama that
+    ignores num_predict 0), its context would carry that reply, so it is
+    not cached and each turn sends prefix + suffix in full.
+    One instance per conversation; stats() reports prefill time saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._context: Optional[List[int]] = None
+        self._prefill_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.last_turn: Dict[str, Any] = {}
+
+    def generate(self, prefix: str, suffix: str,
+                 on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Generate a reply to prefix + suffix, reusing the cached prefix
+        context when possible. Returns "" on error, like ask_llm.
+        """
+        key = hashlib.sha1(f"{MODEL}\0{prefix}".encode("utf-8")).hexdigest()
+        try:
+            with self._lock:
+                warmed = key == self._key
+                if not warmed:
+                    self._warm(key, prefix)
+                context, prefill_ms = self._context, self._prefill_ms
+            hit = warmed and context is not None
+
+            if context is None:
+                # no reusable context for this prefix; send everything
+                data = _generate({"prompt": prefix + suffix}, on_token)
+            else:
+                data = _generate({"prompt": suffix, "context": context}, on_token)
+        except LLMCancelled:
+            raise
+        except Exception:
+            return ""
+
+        eval_ms = data.get("prompt_eval_duration", 0) / 1e6
+        saved = prefill_ms if hit else 0.0
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved_ms += saved
+            else:
+                self.misses += 1
+            self.last_turn = {"cached": hit, "prompt_eval_ms": eval_ms, "saved_ms": saved}
+        return data.get("response", "").strip()
+
+    def _warm(self, key: str, prefix: str) -> None:
+        data = _generate({"prompt": prefix, "options": {"num_predict": 0}})
+        self._key = key
+        # A context that includes generated tokens isn't a clean prefix
+        clean = not data.get("eval_count") and not data.get("response")
+        self._context = (data.get("context") or None) if clean else None
+        self._prefill_ms = data.get("prompt_eval_duration", 0) / 1e6
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._key = None
+            self._context = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefix_prefill_ms": self._prefill_ms,
+                "saved_ms_total": self.saved_ms,
+                "saved_ms_per_turn": self.saved_ms / turns if turns else 0.0,
+                "last_turn": dict(self.last_turn),
+            }
+
 def ask_chat(messages: List[Dict[str,str]]) -> str:
     """
     Send a chat-completions request to Ollama.
@@ -65,21 +275,23 @@ def ask_chat(messages: List[Dict[str,str]]) -> str:
 # ─── File Indexing & Resolution ────────────────────────────────────────────────
 
 known_files: List[str] = []
+# On top of fswalk.DEFAULT_EXCLUDES; anchored to the indexed root
+INDEX_EXCLUDES = ["/memory"]
 
 def index_files(start_path: str) -> None:
     """
-    Populate `known_files` with all .py and .yaml/.json files under start_path,
-    skipping venv and hidden folders.
+    Populate `known_files` with every file under start_path, skipping the
+    fswalk default excludes (venv, hidden folders, caches, ...) and the
+    runtime memory/ folder, whose caches and logs change between turns and
+    would otherwise invalidate the cached prompt prefix.
     """
-    global known_files
-    known_files.clear()
-    for dirpath, dirnames, filenames in os.walk(start_path):
-        # skip virtual envs and hidden
-        if "venv" in dirpath or dirpath.strip().startswith("."):
-            continue
-        for fn in filenames:
-            rel = os.path.relpath(os.path.join(dirpath, fn), start_path).replace("\\","/")
-            known_files.append(rel)
+    from aias.utils.fswalk import DEFAULT_EXCLUDES, walk_files
+    found = [
+        f.relative_to(start_path).as_posix()
+        for f in walk_files(Path(start_path), None, DEFAULT_EXCLUDES + INDEX_EXCLUDES)
+    ]
+    # Swap in one step so concurrent handle_input calls never see a half-built list
+    known_files[:] = found
 
 def resolve_path(filename: str) -> Optional[str]:
     """
@@ -116,6 +328,12 @@ def classify_command(text: str) -> Dict[str, Any]:
                     files.add(kf)
     files = list(files)
 
+    # "where is _save_patch" is a lookup, even though it contains "patch";
+    # only a single name or path qualifies, so "find and fix ..." still patches
+    if re.match(r"\s*(where\s+is|where's|locate|find)\s+(the\s+)?"
+                r"(def(inition)?\s+of\s+|(function|class|method|file)\s+)?"
+                r"[\w./\\-]+(\s+defined)?\s*\??\s*$", t):
+        return {"type":"locate","filenames":files}
     if any(k in t for k in ("rename","move")):
         return {"type":"rename","filenames":files}
     if any(k in t for k in ("patch","update","fix","refactor","modify")):
@@ -134,47 +352,194 @@ def classify_command(text: str) -> Dict[str, Any]:
 
 # ─── Traceback Detection ───────────────────────────────────────────────────────
 
-def detect_traceback_issue(text: str) -> Tuple[Optional[str], Optional[str]]:
+_FRAME_RE = re.compile(r'File "(.+?)", line (\d+)')
+_EXC_RE   = re.compile(r"\s*([A-Za-z_][\w.]*)")
+# pytest's own report: "path.py:12: in func" frames (--tb=short), a
+# closing "path.py:12: ValueError" (--tb=long), and "E   " message lines
+_PYTEST_LOC_RE = re.compile(r"(\S+\.py):(\d+):(?:( in \S+)| ([A-Za-z_][\w.]*))?\s*$")
+_PYTEST_E_RE   = re.compile(r"E\s+")
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """
+    Yield lines from a string without splitting it into a list up front,
+    or pass through any iterable of lines (e.g. an open file).
+    """
+    if not isinstance(source, str):
+        for line in source:
+            yield line.rstrip("\r\n")
+        return
+    start, n = 0, len(source)
+    while start < n:
+        end = source.find("\n", start)
+        if end == -1:
+            end = n
+        yield source[start:end].rstrip("\r")
+        start = end + 1
+
+def scan_tracebacks(source: Union[str, Iterable[str]]) -> Iterator[Dict[str, Any]]:
     """
-    Scan text for Python traceback lines and extract (filename, description).
+    Parse every traceback in `source` in one pass and yield each distinct
+    issue once, deduplicated by (file, line, exception type). An issue is
+    {"file", "line", "exception", "description"} for the innermost frame
+    of its traceback. Python tracebacks and pytest failure reports are
+    both understood.
     """
-    fn = None
-    desc = None
-    for line in text.splitlines():
+    seen: Set[Tuple[str, int, str]] = set()
+    fn: Optional[str] = None
+    lineno = 0
+    pytest_msg = ""   # first "E   ..." line, for a --tb=long report's closing location
+
+    def issue(exc: str, desc: str) -> Optional[Dict[str, Any]]:
+        sig = (fn, lineno, exc)
+        if sig in seen:
+            return None
+        seen.add(sig)
+        return {"file": fn, "line": lineno, "exception": exc, "description": desc}
+
+    for line in _iter_lines(source):
+        if line.startswith("E "):
+            line = _PYTEST_E_RE.sub("", line, count=1)
+            pytest_msg = pytest_msg or line.strip()
+        if ".py:" in line:
+            m = _PYTEST_LOC_RE.match(line)
+            if m and (m.group(3) or m.group(4)):
+                fn = m.group(1).replace("\\","/")
+                lineno = int(m.group(2))
+                if m.group(4):
+                    found = issue(m.group(4), f"{pytest_msg or m.group(4)} (line {lineno})")
+                    if found:
+                        yield found
+                    fn, pytest_msg = None, ""
+                continue
         if "File" in line and ", line" in line:
-            m = re.search(r'File "(.+?)", line (\d+)', line)
+            m = _FRAME_RE.search(line)
             if m:
                 fn = m.group(1).replace("\\","/")
-                desc = f"Error at line {m.group(2)} in {fn}"
-        elif ("Error" in line or "Exception" in line) and fn:
-            desc = line.strip()
-    return (fn, desc) if fn and desc else (None, None)
+                lineno = int(m.group(2))
+                continue
+        if fn is None:
+            continue
+        if line.startswith("Traceback (most recent call last)"):
+            # previous block ended without an exception line
+            found = issue("", f"Error at line {lineno} in {fn}")
+            if found:
+                yield found
+            fn = None
+        elif ("Error" in line or "Exception" in line) and not line[:1].isspace():
+            # the exception line is unindented; indented ones are source
+            m = _EXC_RE.match(line)
+            exc = m.group(1) if m else ""
+            found = issue(exc, f"{line.strip()} (line {lineno})")
+            if found:
+                yield found
+            fn, pytest_msg = None, ""
+
+    if fn is not None:
+        found = issue("", f"Error at line {lineno} in {fn}")
+        if found:
+            yield found
+
+def detect_traceback_issue(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Scan text for Python traceback lines and extract (filename, description)
+    of the last issue found. See scan_tracebacks() for all of them.
+    """
+    last = None
+    for last in scan_tracebacks(text):
+        pass
+    return (last["file"], last["description"]) if last else (None, None)
 
 # ─── Patch Queue Helpers ──────────────────────────────────────────────────────
 
-background_tasks = queue.Queue()
+_tasks_conf = _conf.get("tasks", {}) or {}
+# Pending patch work, highest priority first (see aias/scheduler.py)
+background_tasks = TaskScheduler(history_limit=_tasks_conf.get("history_limit", 200))
+# Reflect suggestions not started within this many seconds are dropped
+REFLECT_TTL = _tasks_conf.get("reflect_ttl", 3600)
+
+# Finished proposals awaiting review, oldest dropped beyond MAX_PROPOSALS
+# (every proposal is also kept in the patch archive)
 completed_tasks: List[Tuple[str,str]] = []
+MAX_PROPOSALS = _tasks_conf.get("max_proposals", 200)
+
+# Listeners are called as listener(event, (path, desc)) with event "added" or
+# "removed", on whichever thread made the change.
+PatchListener = Callable[[str, Tuple[str,str]], None]
+_patch_lock = threading.RLock()
+_patch_listeners: List[PatchListener] = []
 
-def enqueue_patch(path: str, desc: str) -> None:
+def enqueue_patch(path: str, desc: str, kind: str = "user",
+                  priority: Optional[int] = None, deadline: Optional[float] = None) -> int:
     """
-    Add a new patch request to the background queue.
+    Add a new patch request to the background scheduler and return its
+    task id. `kind` ("traceback", "user" or "reflect") sets the default
+    priority; reflect suggestions get a REFLECT_TTL deadline unless one
+    is given.
     """
-    background_tasks.put((path, desc))
+    if kind == "reflect" and deadline is None and REFLECT_TTL:
+        deadline = time.time() + REFLECT_TTL
+    return background_tasks.submit(path, desc, kind=kind, priority=priority, deadline=deadline)
 
 def get_pending_patches() -> List[Tuple[str,str]]:
     """
     Return list of patches that have been completed.
     """
-    return completed_tasks.copy()
+    with _patch_lock:
+        return completed_tasks.copy()
+
+def subscribe_patches(listener: PatchListener) -> List[Tuple[str,str]]:
+    """
+    Register `listener` for patch-list changes and return the current list.
+    Both happen under one lock, so no change is missed or seen twice.
+    """
+    with _patch_lock:
+        _patch_listeners.append(listener)
+        return completed_tasks.copy()
+
+def unsubscribe_patches(listener: PatchListener) -> None:
+    with _patch_lock:
+        if listener in _patch_listeners:
+            _patch_listeners.remove(listener)
+
+def _notify_patch(event: str, task: Tuple[str,str]) -> None:
+    for listener in list(_patch_listeners):
+        try:
+            listener(event, task)
+        except Exception:
+            pass
+
+def complete_patch(path: str, desc: str) -> None:
+    """
+    Record a finished patch proposal and notify listeners.
+    """
+    with _patch_lock:
+        completed_tasks.append((path, desc))
+        _notify_patch("added", (path, desc))
+        while len(completed_tasks) > MAX_PROPOSALS:
+            _notify_patch("removed", completed_tasks.pop(0))
+
+def remove_patch(path: str, desc: str) -> bool:
+    """
+    Drop a patch proposal (applied or declined). Returns False if it was not listed.
+    """
+    with _patch_lock:
+        try:
+            completed_tasks.remove((path, desc))
+        except ValueError:
+            return False
+        _notify_patch("removed", (path, desc))
+        return True
 
 # ─── Interaction Logging ──────────────────────────────────────────────────────
 
 LOG_FILE = Path("memory/logs.jsonl")
 LOG_FILE.parent.mkdir(exist_ok=True)
+MEMORY_ENABLED = (_conf.get("memory", {}) or {}).get("enabled", True)
 
 def log_interaction(user: str, ai: str) -> None:
     """
-    Append a JSON line with {"timestamp","user","ai"} to logs.jsonl.
+    Append a JSON line with {"timestamp","user","ai"} to logs.jsonl, then
+    let the long-term vector memory pick it up in the background.
     """
     entry = {
         "timestamp": datetime.now().isoformat(),
@@ -183,3 +548,44 @@ def log_interaction(user: str, ai: str) -> None:
     }
     with open(LOG_FILE, "a", encoding="utf-8") as f:
         f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    if MEMORY_ENABLED:
+        try:
+            from aias.utils.vector_memory import get_memory
+        except ImportError:   # numpy not installed
+            return
+        get_memory().notify()
+
+def read_interactions_before(offset: Optional[int] = None,
+                             limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Read up to `limit` logged interactions that end before byte `offset`
+    (end of file if None), scanning logs.jsonl backwards in blocks so the
+    cost does not depend on how long the log is.
+    Returns (entries oldest-first, offset of the earliest entry returned);
+    pass that offset back in to page further into the past.
+    """
+    if not LOG_FILE.exists():
+        return [], 0
+    block = 64 * 1024
+    entries: List[Dict[str, Any]] = []
+    with open(LOG_FILE, "rb") as f:
+        end = f.seek(0, os.SEEK_END) if offset is None else offset
+        pos = start = end
+        buf = b""   # bytes [pos, start) not yet split into lines
+        while len(entries) < limit and (pos > 0 or buf):
+            nl = buf.rfind(b"\n")
+            if nl == -1 and pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                continue
+            line, buf = buf[nl + 1:], buf[:max(nl, 0)]
+            start = pos + nl + 1
+            if line.strip():
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    entries.reverse()
+    return entries, start
@@ -1,41 +1,116 @@
 import json
 import random
+import re
 import torch
+from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional, Union
 from sentence_transformers import SentenceTransformer
 
+# Seconds per stratum for the named time windows
+WINDOWS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+
+# What a state vector holds; saved with trained models so the router can
+# refuse a policy trained on a different layout
+STATE_LAYOUT = "user+previous_ai"
+
+_TIMESTAMP_RE = re.compile(rb'"timestamp":\s*"([^"]+)"')
+
+def _stratum(line: bytes, seconds: int) -> Optional[int]:
+    m = _TIMESTAMP_RE.search(line)
+    if not m:
+        return None
+    try:
+        return int(datetime.fromisoformat(m.group(1).decode()).timestamp() // seconds)
+    except ValueError:
+        return None
+
+def _parse_pair(line: bytes) -> Optional[Tuple[str, str]]:
+    try:
+        obj = json.loads(line)
+        return obj["user"], obj["ai"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+def reservoir_sample_logs(path: Union[str, Path], k: int,
+                          window: Union[str, int, None] = None,
+                          rng: Optional[random.Random] = None) -> List[Tuple[str, str]]:
+    """
+    Uniformly sample up to k (user, ai) pairs from a JSONL log in one
+    streaming pass, holding only the sample in memory. Lines are parsed
+    only once they win a reservoir slot; a winner that turns out to be
+    malformed is dropped.
+
+    With `window` ("hour", "day", "week", "month" or seconds) the log is
+    stratified by timestamp and every window gets an equal share of k,
+    so a burst of activity can't crowd out quieter periods. When a new
+    window appears every reservoir is shrunk, by uniform subsampling, to
+    the new share, which keeps memory at O(k) (O(windows) if there are
+    more windows than k). Windows with fewer entries than their share
+    leave those slots empty.
+
+    The result is in log order.
+    """
+    rng = rng or random
+    seconds = WINDOWS.get(window, window) if window else None
+    # stratum -> [lines seen, reservoir of (line number, raw line)]
+    strata: Dict[Optional[int], List[Any]] = {}
+    quota = k
+
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f):
+            if b'"user"' not in line or b'"ai"' not in line:
+                continue
+            key = _stratum(line, seconds) if seconds else None
+            slot = strata.get(key)
+            if slot is None:
+                slot = strata[key] = [0, []]
+                quota = max(1, k // len(strata))
+                for other in strata.values():
+                    if len(other[1]) > quota:
+                        other[1] = rng.sample(other[1], quota)
+            slot[0] += 1
+            reservoir = slot[1]
+            if len(reservoir) < quota:
+                reservoir.append((lineno, line))
+            else:
+                j = rng.randrange(slot[0])
+                if j < quota:
+                    reservoir[j] = (lineno, line)
+
+    picked = [item for _, reservoir in strata.values() for item in reservoir]
+    if len(picked) > k:
+        picked = rng.sample(picked, k)
+    picked.sort()
+    pairs = (_parse_pair(line) for _, line in picked)
+    return [p for p in pairs if p is not None]
+
 class ProceduralConversationEnv:
     """
     A procedurally‐generated conversational RL environment based on past logs.
-    - Samples real user utterances from memory/logs.jsonl
+    - Samples real user utterances from memory/logs.jsonl (reservoir sampling,
+      optionally stratified by time window, so the log is never loaded whole)
     - Generates candidate AI responses via semantic clustering on past AI replies
     - Rewards based on whether the next real user message shows approval vs. clarification
+
+    A state is [emb(user message to answer), emb(AI reply before it)], the
+    same thing the router sees when a message arrives; the action is
+    rewarded when it picks the logged reply to that message.
     """
     def __init__(self,
                  logs_path: str = "memory/logs.jsonl",
                  embed_model_name: str = "all-MiniLM-L6-v2",
-                 sample_size: int = 100):
-        # Load past interactions, skipping bad lines
-        self.logs = []
+                 sample_size: int = 100,
+                 stratify_window: Union[str, int, None] = None):
+        # Stream the log once, keeping only a uniform sample of valid pairs
         p = Path(logs_path)
         if not p.exists():
             raise FileNotFoundError(f"No logs at {logs_path}")
-        for line in p.read_text(encoding="utf-8").splitlines():
-            try:
-                obj = json.loads(line)
-                u = obj["user"]
-                a = obj["ai"]
-                self.logs.append((u, a))
-            except (json.JSONDecodeError, KeyError):
-                # Skip lines that aren't properly formatted
-                continue
+        self.sample = reservoir_sample_logs(p, sample_size, stratify_window)
 
-        if not self.logs:
+        if not self.sample:
             raise RuntimeError("No valid user/ai pairs in logs.")
 
-        # Sample a subset for speed
-        self.sample = random.sample(self.logs, min(sample_size, len(self.logs)))
         # Build pools
         self.user_msgs = [u for u,_ in self.sample]
         self.ai_msgs   = [a for _,a in self.sample]
@@ -58,32 +133,31 @@ class ProceduralConversationEnv:
         return len(self.ai_msgs)
 
     def reset(self) -> torch.Tensor:
-        """Pick a random log entry as the starting point."""
+        """Pick a random log entry's user message as the one to answer."""
         self.cur_idx = random.randrange(len(self.sample))
-        self.last_user, self.last_ai = self.sample[self.cur_idx]
+        self.last_user = self.sample[self.cur_idx][0]
+        # The sample keeps log order, so the previous entry's reply came before it
+        self.last_ai = self.sample[self.cur_idx - 1][1]
         self.done = False
         return self._build_state()
 
     def step(self, action_idx: int) -> Tuple[torch.Tensor, float, bool, Dict[str,Any]]:
-        """Agent picks an index into the ai_msgs pool."""
-        # Record chosen reply
+        """Agent picks an index into the ai_msgs pool as its reply to last_user."""
         chosen = self.ai_msgs[action_idx]
-        self.last_ai = chosen
-
-        # Move to next real log entry
-        self.cur_idx = (self.cur_idx + 1) % len(self.sample)
-        next_user, next_ai = self.sample[self.cur_idx]
+        actual_ai = self.sample[self.cur_idx][1]
 
-        # Reward: +1 if the real AI reply matches our chosen index,
-        #   else -0.5 if our choice differs and user immediately asks clarification
-        reward = 1.0 if chosen == next_ai else -0.5
+        # Reward: +1 if our reply matches the real reply to this message,
+        #   else -0.5 as if the user had to ask for clarification
+        reward = 1.0 if chosen == actual_ai else -0.5
         # Done after one turn
         self.done = True
 
-        # Update state to new pair
-        self.last_user = next_user
+        # Next state: the following user message, after the reply we chose
+        self.cur_idx = (self.cur_idx + 1) % len(self.sample)
+        self.last_user = self.sample[self.cur_idx][0]
+        self.last_ai = chosen
         state = self._build_state()
-        info = {"actual_ai": next_ai, "chosen_ai": chosen}
+        info = {"actual_ai": actual_ai, "chosen_ai": chosen}
         return state, reward, self.done, info
 
     def _build_state(self) -> torch.Tensor:
@@ -0,0 +1,169 @@
+# aias/router.py
+
+"""
+Tiered reply routing for chat messages.
+
+Tier 1 runs the trained DQN (models/dqn_model.pth) over the candidate
+response pool saved with it and answers with the best canned reply when
+the policy is confident enough. Everything else goes to tier 2, the LLM.
+
+The state is built the way ProceduralConversationEnv builds it: the
+embeddings of the incoming user message and of the AI reply before it.
+The policy is trained to pick the reply to that message. A model saved
+without the env's current STATE_LAYOUT (trained on an older state) is not
+served; retrain it to turn tier 1 back on.
+Each decision is appended to memory/routing.jsonl with its latency.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aias.core import load_config
+
+MODELS_DIR     = Path(__file__).parent / "models"
+MODEL_PATH     = MODELS_DIR / "dqn_model.pth"
+RESPONSES_PATH = MODELS_DIR / "dqn_responses.json"
+ROUTING_LOG    = Path("memory/routing.jsonl")
+
+_routing_conf  = load_config().get("routing", {}) or {}
+ENABLED        = _routing_conf.get("enabled", True)
+# Gap between the best and second-best Q-values needed to skip the LLM.
+# Q-values are in reward units (+1 right reply, -0.5 wrong), not probabilities.
+MIN_MARGIN     = _routing_conf.get("min_margin", 0.5)
+
+
+class ResponseRouter:
+    """
+    Loads the policy lazily on first use. If the model or its response
+    pool is missing, or their sizes disagree, tier 1 is disabled and every
+    message falls through to the LLM.
+    """
+
+    def __init__(self,
+                 model_path: Path = MODEL_PATH,
+                 responses_path: Path = RESPONSES_PATH,
+                 min_margin: float = MIN_MARGIN,
+                 enabled: bool = ENABLED):
+        self.model_path = Path(model_path)
+        self.responses_path = Path(responses_path)
+        self.min_margin = min_margin
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._model = None
+        self._responses: List[str] = []
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not (self.enabled and self.model_path.exists() and self.responses_path.exists()):
+            return
+        try:
+            import torch
+            from aias.commands.rltrainingcommand import DQN
+            from aias.envs.procedural_conversation_env import STATE_LAYOUT
+
+            pool = json.loads(self.responses_path.read_text(encoding="utf-8"))
+            if not isinstance(pool, dict) or pool.get("state_layout") != STATE_LAYOUT:
+                print("⚠️ DQN was trained on an older state layout; retrain it to enable routing.")
+                return
+            responses = pool["responses"]
+            state = torch.load(self.model_path, map_location="cpu", weights_only=True)
+            s_dim = state["net.0.weight"].shape[1]
+            a_dim = state["net.4.weight"].shape[0]
+            if a_dim != len(responses):
+                print(f"⚠️ DQN has {a_dim} actions but {len(responses)} saved responses; routing disabled.")
+                return
+            model = DQN(s_dim, a_dim)
+            model.load_state_dict(state)
+            model.eval()
+            self._model, self._responses = model, responses
+        except Exception as e:
+            print(f"⚠️ Could not load DQN router: {e}")
+
+    def route(self, user_text: str, last_ai: str = "") -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Pick a reply to `user_text`, given the AI reply before it.
+        Return (reply, decision). reply is None when the message should go
+        to the LLM; decision describes what tier 1 saw either way.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._load()
+        if self._model is None:
+            return None, {"tier": "llm", "reason": "no policy"}
+        if not last_ai:
+            # Every training state has a previous reply
+            return None, {"tier": "llm", "reason": "no previous reply"}
+
+        import torch
+        from aias.utils.nlp_engine import embed_async
+
+        # Same state layout as training: [emb(user message), emb(previous ai reply)]
+        u_fut, a_fut = embed_async(user_text), embed_async(last_ai)
+        state = torch.cat([torch.as_tensor(u_fut.result()), torch.as_tensor(a_fut.result())]).float()
+        if state.shape[0] != self._model.net[0].in_features:
+            return None, {"tier": "llm", "reason": "state size mismatch"}
+
+        with torch.no_grad():
+            q = self._model(state)
+        if q.shape[0] > 1:
+            top = torch.topk(q, 2)
+            margin, action = float(top.values[0] - top.values[1]), int(top.indices[0])
+        else:
+            margin, action = float("inf"), 0
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        decision = {"action": action, "margin": round(margin, 4), "dqn_ms": round(latency_ms, 2)}
+        if margin >= self.min_margin:
+            decision["tier"] = "dqn"
+            self.record("dqn", latency_ms, decision)
+            return self._responses[action], decision
+        decision["tier"] = "llm"
+        decision["reason"] = "low margin"
+        return None, decision
+
+    def record(self, tier: str, latency_ms: float, decision: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Log a routing outcome and update per-tier latency stats.
+        """
+        with self._lock:
+            st = self._stats.setdefault(tier, {"count": 0, "total_ms": 0.0})
+            st["count"] += 1
+            st["total_ms"] += latency_ms
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "tier": tier,
+            "latency_ms": round(latency_ms, 2),
+            **{k: v for k, v in (decision or {}).items() if k != "tier"},
+        }
+        try:
+            ROUTING_LOG.parent.mkdir(exist_ok=True)
+            with open(ROUTING_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                tier: {"count": st["count"], "avg_ms": st["total_ms"] / st["count"]}
+                for tier, st in self._stats.items()
+            }
+
+
+_router: Optional[ResponseRouter] = None
+_router_lock = threading.Lock()
+
+def get_router() -> ResponseRouter:
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ResponseRouter()
+    return _router
@@ -0,0 +1,314 @@
+# aias/scheduler.py
+
+"""
+Priority scheduler for background patch tasks.
+
+Tasks are ordered by priority (lower runs first; traceback fixes ahead of
+user requests ahead of self-reflection suggestions), then by deadline,
+then by submission order. A queued task can be cancelled or reprioritised;
+one past its deadline is expired instead of run. Every task records its
+state and timings, finished tasks are kept in a bounded history, and
+`snapshot()` returns a consistent copy for the CLI and GUI.
+
+`put` / `get` / `task_done` keep the queue.Queue interface the patch
+worker and SelfImproveCommand were written against: get() raises
+queue.Empty on timeout, and put(None) queues a stop sentinel behind the
+tasks already queued. Unlike queue.Queue, task_done() must be called on
+the thread that called get(), and there is no join().
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Lower runs first
+PRIORITIES = {"traceback": 0, "user": 10, "reflect": 20}
+DEFAULT_KIND = "user"
+HISTORY_LIMIT = 200
+
+# Heap entries with this task id are put(None) stop sentinels; real ids start at 1
+_STOP_ID = 0
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, EXPIRED = (
+    "queued", "running", "done", "failed", "cancelled", "expired"
+)
+FINAL_STATES = (DONE, FAILED, CANCELLED, EXPIRED)
+
+# listener(event, task) with event "submitted", "updated" or "evicted" and
+# task a dict from Task.as_dict(); called on whichever thread made the change
+TaskListener = Callable[[str, Dict[str, Any]], None]
+
+
+class Task:
+    """
+    One patch request: propose a change to `path` described by `desc`.
+    """
+
+    __slots__ = ("id", "path", "desc", "kind", "priority", "deadline", "state",
+                 "created", "started", "finished", "error", "cancel_requested", "_version")
+
+    def __init__(self, task_id: int, path: str, desc: str, kind: str,
+                 priority: int, deadline: Optional[float]):
+        self.id = task_id
+        self.path = path
+        self.desc = desc
+        self.kind = kind
+        self.priority = priority
+        self.deadline = deadline
+        self.state = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        # Set by cancel() on a running task; the patch worker checks it
+        # between its LLM call and the archive / approve / apply steps
+        self.cancel_requested = False
+        self._version = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        end = self.finished or time.time()
+        return {
+            "id": self.id,
+            "path": self.path,
+            "desc": self.desc,
+            "kind": self.kind,
+            "priority": self.priority,
+            "deadline": self.deadline,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "wait_s": (self.started or end) - self.created,
+            "run_s": end - self.started if self.started else None,
+            "error": self.error,
+        }
+
+
+class TaskScheduler:
+    """
+    Thread-safe priority queue of Tasks with a bounded history. Workers
+    call `next()` and then `finish()`; everything else may be called from
+    any thread.
+    """
+
+    def __init__(self, history_limit: int = HISTORY_LIMIT):
+        self.history_limit = history_limit
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, float, int, int, int]] = []
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._active: Dict[int, Task] = {}                  # queued + running
+        self._history: "OrderedDict[int, Task]" = OrderedDict()
+        self._listeners: List[TaskListener] = []
+        self._local = threading.local()
+
+    # ─── Submitting and steering ──────────────────────────────────────
+
+    def submit(self, path: str, desc: str, kind: str = DEFAULT_KIND,
+               priority: Optional[int] = None, deadline: Optional[float] = None) -> int:
+        """
+        Queue a task and return its id. `priority` defaults from `kind`;
+        `deadline` is a time.time() value after which the task is expired
+        rather than started.
+        """
+        if priority is None:
+            priority = PRIORITIES.get(kind, PRIORITIES[DEFAULT_KIND])
+        with self._cond:
+            task = Task(next(self._ids), path, desc, kind, priority, deadline)
+            self._active[task.id] = task
+            self._push(task)
+            self._emit("submitted", task)
+            self._cond.notify()
+            return task.id
+
+    def _push(self, task: Task) -> None:
+        deadline = task.deadline if task.deadline is not None else float("inf")
+        heapq.heappush(self._heap, (task.priority, deadline, next(self._seq), task.id, task._version))
+
+    def cancel(self, task_id: int) -> bool:
+        """
+        Cancel a queued task, or ask a running one to stop: the worker sees
+        `cancel_requested` and drops the task at its next check. Returns
+        False if the task is unknown or already finished.
+        """
+        with self._cond:
+            task = self._active.get(task_id)
+            if task is None:
+                return False
+            if task.state == RUNNING:
+                task.cancel_requested = True
+                self._emit("updated", task)
+            else:
+                self._retire(task, CANCELLED)
+            return True
+
+    def reprioritize(self, task_id: int, priority: int) -> bool:
+        """
+        Move a queued task to a new priority. Returns False unless it is queued.
+        """
+        with self._cond:
+            task = self._active.get(task_id)
+            if task is None or task.state != QUEUED:
+                return False
+            task.priority = priority
+            task._version += 1   # its old heap entry is now stale
+            self._push(task)
+            self._emit("updated", task)
+            return True
+
+    # ─── Workers ──────────────────────────────────────────────────────
+
+    def next(self, timeout: Optional[float] = None) -> Optional[Task]:
+        """
+        Block until a task is runnable and mark it running. Returns None on
+        timeout or when it reaches a stop sentinel queued with put(None).
+        """
+        try:
+            return self._take(timeout)
+        except queue.Empty:
+            return None
+
+    def _take(self, timeout: Optional[float]) -> Optional[Task]:
+        # Like next(), but a timeout raises queue.Empty so get() can tell it
+        # apart from a stop sentinel
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                while self._heap:
+                    _, _, _, task_id, version = heapq.heappop(self._heap)
+                    if task_id == _STOP_ID:
+                        return None
+                    task = self._active.get(task_id)
+                    if task is None or task._version != version or task.state != QUEUED:
+                        continue
+                    if task.deadline is not None and time.time() > task.deadline:
+                        self._retire(task, EXPIRED)
+                        continue
+                    task.state = RUNNING
+                    task.started = time.time()
+                    self._emit("updated", task)
+                    return task
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._cond.wait(remaining)
+
+    def finish(self, task: Task, error: Optional[BaseException] = None) -> None:
+        """
+        Record the outcome of a task returned by next().
+        """
+        with self._cond:
+            if task.state != RUNNING:
+                return
+            if error is not None:
+                task.error = f"{type(error).__name__}: {error}"
+                self._retire(task, FAILED)
+            else:
+                self._retire(task, CANCELLED if task.cancel_requested else DONE)
+
+    def _retire(self, task: Task, state: str) -> None:
+        task.state = state
+        task.finished = time.time()
+        self._active.pop(task.id, None)
+        self._history[task.id] = task
+        self._emit("updated", task)
+        while len(self._history) > self.history_limit:
+            _, old = self._history.popitem(last=False)
+            self._emit("evicted", old)
+
+    # ─── Inspection ───────────────────────────────────────────────────
+
+    def get_task(self, task_id: int) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            task = self._active.get(task_id) or self._history.get(task_id)
+            return task.as_dict() if task else None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Every known task as a dict: running, then queued in run order, then
+        finished ones newest first.
+        """
+        with self._cond:
+            active = sorted(self._active.values(), key=lambda t: (
+                t.state != RUNNING, t.priority,
+                t.deadline if t.deadline is not None else float("inf"), t.id,
+            ))
+            return [t.as_dict() for t in active] + \
+                [t.as_dict() for t in reversed(self._history.values())]
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINAL_STATES}
+            for task in list(self._active.values()) + list(self._history.values()):
+                counts[task.state] += 1
+            return counts
+
+    def subscribe(self, listener: TaskListener) -> List[Dict[str, Any]]:
+        """
+        Register `listener` for task events and return the current
+        snapshot, under one lock so no event is missed or seen twice.
+        """
+        with self._cond:
+            self._listeners.append(listener)
+            return self.snapshot()
+
+    def unsubscribe(self, listener: TaskListener) -> None:
+        with self._cond:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _emit(self, event: str, task: Task) -> None:
+        if not self._listeners:
+            return
+        data = task.as_dict()
+        for listener in list(self._listeners):
+            try:
+                listener(event, data)
+            except Exception:
+                pass
+
+    # ─── queue.Queue compatibility ────────────────────────────────────
+
+    def put(self, item: Optional[Tuple[str, str]]) -> None:
+        """
+        put((path, desc)) queues a user-priority task. put(None) queues a
+        stop sentinel behind every task queued so far (it sorts after the
+        lowest priority among them); the get()/next() that reaches it
+        returns None.
+        """
+        if item is None:
+            with self._cond:
+                queued = [t.priority for t in self._active.values() if t.state == QUEUED]
+                priority = max(queued + [PRIORITIES[DEFAULT_KIND]])
+                heapq.heappush(self._heap, (priority, float("inf"), next(self._seq), _STOP_ID, 0))
+                self._cond.notify()
+            return
+        path, desc = item
+        self.submit(path, desc)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Optional[Tuple[str, str]]:
+        """
+        Take the next task as (path, desc), or None for a stop sentinel;
+        finish it with task_done() on the same thread. Raises queue.Empty
+        if nothing is runnable within `timeout` (at once if not `block`).
+        """
+        task = self._take(timeout if block else 0)
+        self._local.task = task
+        return (task.path, task.desc) if task else None
+
+    def task_done(self) -> None:
+        task = getattr(self._local, "task", None)
+        if task is not None:
+            self._local.task = None
+            self.finish(task)
+
+    def qsize(self) -> int:
+        with self._cond:
+            return sum(1 for t in self._active.values() if t.state == QUEUED)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
@@ -0,0 +1,118 @@
+# aias/scripts/bench_diff.py
+
+"""
+Benchmark aias.utils.fastdiff against difflib on synthetic Python-like files.
+
+    python -m aias.scripts.bench_diff [--sizes 10000 50000 100000] [--difflib-max 50000]
+
+Each size is run for a light edit (~1% of lines touched), a heavy
+rewrite (~40% of lines changed, blocks moved), which is what a full-file
+LLM rewrite looks like, and a file built from a small set of repeated
+lines with scattered inserts/deletes, which is difflib's worst case. difflib is skipped above --difflib-max lines
+because it can take minutes there.
+"""
+
+import argparse
+import difflib
+import random
+import time
+
+from aias.utils import fastdiff
+
+
+def make_file(n: int, rng: random.Random) -> list:
+    lines = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.1:
+            lines.append(f"def func_{i}(arg_{i % 17}):\n")
+        elif kind < 0.2:
+            lines.append("\n")
+        elif kind < 0.3:
+            lines.append("        return None\n")
+        else:
+            lines.append(f"    value_{i} = compute({rng.randrange(1000)}, {i})\n")
+    return lines
+
+
+def light_edit(lines: list, rng: random.Random) -> list:
+    out = list(lines)
+    for _ in range(max(1, len(out) // 100)):
+        out[rng.randrange(len(out))] = f"    patched = {rng.randrange(10**6)}\n"
+    return out
+
+
+def heavy_rewrite(lines: list, rng: random.Random) -> list:
+    out = []
+    for line in lines:
+        r = rng.random()
+        if r < 0.25:
+            out.append(line.replace("value_", "result_"))
+        elif r < 0.35:
+            continue
+        elif r < 0.4:
+            out.append(line)
+            out.append("    # rewritten\n")
+        else:
+            out.append(line)
+    # move a few large blocks around
+    for _ in range(5):
+        i = rng.randrange(len(out))
+        block = out[i:i + 200]
+        del out[i:i + 200]
+        j = rng.randrange(len(out) + 1)
+        out[j:j] = block
+    return out
+
+
+def repetitive(n: int, rng: random.Random) -> tuple:
+    vocab = [f"    x{i} = {i}\n" for i in range(300)]
+    old = [rng.choice(vocab) for _ in range(n)]
+    new = list(old)
+    for _ in range(n // 50):
+        p = rng.randrange(len(new))
+        r = rng.random()
+        if r < 0.3:
+            new[p] = rng.choice(vocab)
+        elif r < 0.6:
+            del new[p]
+        else:
+            new.insert(p, rng.choice(vocab))
+    return old, new
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = list(fn(*args))
+    return time.perf_counter() - t0, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--difflib-max", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'lines':>8} {'case':<8} {'difflib s':>10} {'fastdiff s':>11} {'speedup':>8} {'diff lines':>11}")
+    for n in args.sizes:
+        base = make_file(n, rng)
+        cases = [
+            ("light", base, light_edit(base, rng)),
+            ("rewrite", base, heavy_rewrite(base, rng)),
+            ("repeat",) + repetitive(n, rng),
+        ]
+        for case, old, new in cases:
+            t_fast, fast = timed(fastdiff.unified_diff, old, new, "a", "b")
+            if n <= args.difflib_max:
+                t_lib, lib = timed(difflib.unified_diff, old, new, "a", "b")
+                speedup = f"{t_lib / t_fast:7.1f}x"
+                t_lib_s = f"{t_lib:10.3f}"
+            else:
+                speedup, t_lib_s = "    n/a", "   skipped"
+            print(f"{n:>8} {case:<8} {t_lib_s} {t_fast:11.3f} {speedup:>8} {len(fast):>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# aias/scripts/bench_ocr.py
+
+"""
+Benchmark incremental screen OCR against full-frame OCR, headless.
+
+    python -m aias.scripts.bench_ocr [frame.png ...] [--frames 30] [--band-height 64]
+
+With image paths the frames are read in the given order. Without them a
+terminal-like session is synthesized: a 1920x1080 screen of text where
+most frames change one line (typing), some change nothing, and every
+tenth scrolls the whole screen. Needs tesseract on PATH.
+"""
+
+import argparse
+import random
+import time
+
+from PIL import Image, ImageDraw
+
+from aias.commands.screen import IncrementalOCR, BAND_HEIGHT
+import pytesseract
+
+WIDTH, HEIGHT = 1920, 1080
+LINE_HEIGHT = 18
+WORDS = "def class return import self value index patch file error line model token cache".split()
+
+
+def random_line(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 14)))
+
+
+def render(lines):
+    img = Image.new("RGB", (WIDTH, HEIGHT), "white")
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((10, 4 + i * LINE_HEIGHT), line, fill="black")
+    return img
+
+
+def synth_frames(n, seed=0):
+    rng = random.Random(seed)
+    rows = (HEIGHT - 8) // LINE_HEIGHT
+    lines = [random_line(rng) for _ in range(rows)]
+    for i in range(n):
+        if i % 10 == 9:
+            lines = lines[3:] + [random_line(rng) for _ in range(3)]
+        elif rng.random() < 0.7:
+            row = rng.randrange(rows)
+            lines[row] = lines[row] + " " + rng.choice(WORDS)
+        yield render(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("images", nargs="*")
+    ap.add_argument("--frames", type=int, default=30)
+    ap.add_argument("--band-height", type=int, default=BAND_HEIGHT)
+    args = ap.parse_args()
+
+    if args.images:
+        frames = [Image.open(p).convert("RGB") for p in args.images]
+    else:
+        frames = list(synth_frames(args.frames))
+
+    start = time.perf_counter()
+    for img in frames:
+        pytesseract.image_to_string(img)
+    full = time.perf_counter() - start
+
+    reader = IncrementalOCR(args.band_height)
+    start = time.perf_counter()
+    for img in frames:
+        reader.process(img)
+    incremental = time.perf_counter() - start
+
+    s = reader.stats
+    print(f"frames:       {len(frames)}")
+    print(f"full OCR:     {full * 1000 / len(frames):8.1f} ms/frame")
+    print(f"incremental:  {incremental * 1000 / len(frames):8.1f} ms/frame  ({full / max(incremental, 1e-9):.1f}x)")
+    print(f"unchanged:    {s['unchanged']} frames skipped")
+    print(f"bands OCR'd:  {s['bands_ocrd']}/{s['bands']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# aias/server.py
+
+"""
+HTTP / WebSocket front-end for handle_input, so several users or tools can
+share one warm AIAS process.
+
+    python -m aias.server [--host 127.0.0.1] [--port 8765]
+
+Endpoints:
+  POST /sessions                          → {"session_id"}
+  POST /sessions/{id}/messages {"text"}   → {"reply"}; add ?stream=1 for
+                                            NDJSON {"token"} lines, then {"reply"}
+  GET  /sessions/{id}/history             → {"history": [{"user","ai"}, ...],
+                                             "prefix_cache": {...stats}}
+  GET  /ws[?session_id=...]               → WebSocket; send {"text"}, receive
+                                            {"type":"token"|"reply"|"error", "data"}
+  GET  /health                            → session, in-flight, LLM dedup and task counts
+  GET  /tasks                             → {"tasks": [...]} background patch tasks
+  DELETE /tasks/{id}                      → cancel a queued or running task
+
+Per-session state (history, conversation memory, in-flight request) lives
+in Session objects; the file index, encoder and LLM client stay
+process-wide in aias.core.
+Messages within one session are handled in order; different sessions run
+concurrently on a thread pool.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from aiohttp import web, WSMsgType
+
+from aias.agent import handle_input
+from aias.conversation import ConversationContext
+from aias.core import LLMCancelled, load_config, index_files, llm_flights, background_tasks
+
+_server_conf = load_config().get("server", {}) or {}
+HOST          = _server_conf.get("host", "127.0.0.1")
+PORT          = _server_conf.get("port", 8765)
+WORKERS       = _server_conf.get("workers", 8)
+SESSION_TTL   = _server_conf.get("session_ttl", 3600)
+HISTORY_LIMIT = _server_conf.get("history_limit", 200)
+# Seconds between background re-walks of the shared file index
+INDEX_REFRESH = _server_conf.get("index_refresh", 30)
+
+_DONE = object()
+
+
+class Session:
+    """
+    One client conversation. `context` is its bounded prompt memory;
+    `lock` serialises its messages; `cancel` is set when the client goes
+    away so a streaming reply stops early.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.context = ConversationContext()
+        self.history: deque = deque(maxlen=HISTORY_LIMIT)
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.cancel = threading.Event()
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+class AiasServer:
+    def __init__(self, workers: int = WORKERS):
+        self.sessions: Dict[str, Session] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aias-session")
+        self.inflight = 0
+
+    # ─── Sessions ────────────────────────────────────────────────────────────
+
+    def new_session(self) -> Session:
+        session = Session()
+        self.sessions[session.id] = session
+        return session
+
+    def get_session(self, session_id: Optional[str]) -> Session:
+        session = self.sessions.get(session_id or "")
+        if session is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "unknown session"}),
+                                   content_type="application/json")
+        session.touch()
+        return session
+
+    async def _refresh_index(self) -> None:
+        """
+        Keep the shared file index current; handle_input is told not to
+        re-walk the tree on every message.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(INDEX_REFRESH)
+            await loop.run_in_executor(self.executor, index_files, os.getcwd())
+
+    async def _expire_sessions(self) -> None:
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - SESSION_TTL
+            for sid in [sid for sid, s in self.sessions.items()
+                        if s.last_active < cutoff and not s.lock.locked()]:
+                del self.sessions[sid]
+
+    # ─── Request handling ────────────────────────────────────────────────────
+
+    async def run(self, session: Session, text: str, on_token=None) -> str:
+        """
+        Run handle_input for `session` on the worker pool. `on_token` is an
+        async callback receiving streamed chunks on the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def token_cb(chunk: str) -> None:
+            if session.cancel.is_set():
+                raise LLMCancelled()
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        async with session.lock:
+            session.cancel.clear()
+            self.inflight += 1
+            fut = loop.run_in_executor(
+                self.executor,
+                lambda: handle_input(text, on_token=token_cb if on_token else None,
+                                     context=session.context, refresh_index=False),
+            )
+            fut.add_done_callback(lambda _: loop.call_soon_threadsafe(chunks.put_nowait, _DONE))
+            try:
+                if on_token:
+                    while True:
+                        chunk = await chunks.get()
+                        if chunk is _DONE:
+                            break
+                        await on_token(chunk)
+                reply = await fut
+            finally:
+                if not fut.done():
+                    # The client went away. Stop streaming, but keep the
+                    # session locked until the worker is done with its context.
+                    session.cancel.set()
+                    while not fut.done():
+                        try:
+                            await asyncio.shield(fut)
+                        except asyncio.CancelledError:
+                            continue
+                        except Exception:
+                            break
+                self.inflight -= 1
+            session.history.append({"user": text, "ai": reply})
+            session.touch()
+            return reply
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        return web.json_response({"session_id": self.new_session().id})
+
+    async def post_message(self, request: web.Request) -> web.StreamResponse:
+        session = self.get_session(request.match_info["sid"])
+        body = await request.json()
+        text = str(body.get("text", "")).strip()
+        if not text:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "empty text"}),
+                                     content_type="application/json")
+
+        if request.query.get("stream") not in ("1", "true"):
+            try:
+                reply = await self.run(session, text)
+            except LLMCancelled:
+                reply = ""
+            return web.json_response({"reply": reply})
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+
+        async def send(chunk: str) -> None:
+            await resp.write((json.dumps({"token": chunk}) + "\n").encode("utf-8"))
+
+        try:
+            reply = await self.run(session, text, on_token=send)
+            await resp.write((json.dumps({"reply": reply, "done": True}) + "\n").encode("utf-8"))
+        except (ConnectionResetError, asyncio.CancelledError):
+            session.cancel.set()
+            raise
+        except LLMCancelled:
+            pass
+        await resp.write_eof()
+        return resp
+
+    async def get_history(self, request: web.Request) -> web.Response:
+        session = self.get_session(request.match_info["sid"])
+        return web.json_response({
+            "history": list(session.history),
+            "prefix_cache": session.context.prefix_cache.stats(),
+        })
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        sid = request.query.get("session_id")
+        session = self.get_session(sid) if sid else self.new_session()
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        await ws.send_json({"type": "session", "data": session.id})
+
+        async def send(chunk: str) -> None:
+            await ws.send_json({"type": "token", "data": chunk})
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    text = str(json.loads(msg.data).get("text", "")).strip()
+                except (json.JSONDecodeError, AttributeError):
+                    text = ""
+                if not text:
+                    await ws.send_json({"type": "error", "data": "expected {\"text\": ...}"})
+                    continue
+                try:
+                    reply = await self.run(session, text, on_token=send)
+                    await ws.send_json({"type": "reply", "data": reply})
+                except LLMCancelled:
+                    await ws.send_json({"type": "error", "data": "cancelled"})
+        finally:
+            # stop any reply still streaming to a closed socket
+            session.cancel.set()
+        return ws
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "inflight": self.inflight,
+            "llm": llm_flights.stats(),
+            "tasks": background_tasks.stats(),
+        })
+
+    async def get_tasks(self, request: web.Request) -> web.Response:
+        return web.json_response({"tasks": background_tasks.snapshot()})
+
+    async def cancel_task(self, request: web.Request) -> web.Response:
+        try:
+            task_id = int(request.match_info["tid"])
+        except ValueError:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "task id must be an integer"}),
+                                     content_type="application/json")
+        if not background_tasks.cancel(task_id):
+            raise web.HTTPNotFound(text=json.dumps({"error": "no such queued or running task"}),
+                                   content_type="application/json")
+        return web.json_response({"task": background_tasks.get_task(task_id)})
+
+    # ─── App ─────────────────────────────────────────────────────────────────
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/sessions", self.create_session)
+        app.router.add_post("/sessions/{sid}/messages", self.post_message)
+        app.router.add_get("/sessions/{sid}/history", self.get_history)
+        app.router.add_get("/ws", self.websocket)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/tasks", self.get_tasks)
+        app.router.add_delete("/tasks/{tid}", self.cancel_task)
+
+        async def on_startup(app: web.Application) -> None:
+            # build the shared file index before the first request, then
+            # refresh it every INDEX_REFRESH seconds instead of per message
+            await asyncio.get_running_loop().run_in_executor(self.executor, index_files, os.getcwd())
+            app["expiry"] = asyncio.create_task(self._expire_sessions())
+            app["reindex"] = asyncio.create_task(self._refresh_index())
+
+        async def on_cleanup(app: web.Application) -> None:
+            app["expiry"].cancel()
+            app["reindex"].cancel()
+            self.executor.shutdown(wait=False)
+
+        app.on_startup.append(on_startup)
+        app.on_cleanup.append(on_cleanup)
+        return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve AIAS over HTTP and WebSocket.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    print(f"🧠 AIAS server on http://{args.host}:{args.port}")
+    web.run_app(AiasServer(args.workers).make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
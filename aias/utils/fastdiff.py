@@ -0,0 +1,337 @@
+# aias/utils/fastdiff.py
+
+"""
+Line diff for large files, emitting the same unified-diff format as
+difflib.unified_diff.
+
+Lines are interned to integers, the common prefix/suffix is trimmed, and
+the rest is split recursively on lines that occur exactly once on each side
+(patience-style anchors). Gaps with no unique lines are solved with Myers'
+O(ND) algorithm when small enough, and otherwise split histogram-style
+around the longest common run through their least frequent shared line.
+Small inputs go straight to difflib, so their output is byte-for-byte what
+it was before; for large ones the hunks are valid and in the same format,
+but may differ from difflib's where several minimal diffs exist.
+"""
+
+import difflib
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Inputs with fewer lines than this (both sides together) use difflib
+SMALL_INPUT_LINES = 2000
+# Anchorless gaps up to this many lines (both sides) are solved with Myers...
+MYERS_MAX_LINES = 20000
+# ...as long as they need at most this many edits
+MYERS_MAX_EDITS = 1000
+# Lines repeated more often than this are never used to split a gap
+RARE_LINE_MAX_COUNT = 1024
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def unified_diff(a: Sequence[str], b: Sequence[str], fromfile: str = "", tofile: str = "",
+				 fromfiledate: str = "", tofiledate: str = "", n: int = 3,
+				 lineterm: str = "\n") -> Iterator[str]:
+	"""
+	Drop-in replacement for difflib.unified_diff.
+	"""
+	if len(a) + len(b) < SMALL_INPUT_LINES:
+		yield from difflib.unified_diff(a, b, fromfile, tofile, fromfiledate, tofiledate, n, lineterm)
+		return
+
+	started = False
+	for group in _group_opcodes(get_opcodes(a, b), n):
+		if not started:
+			started = True
+			fromdate = f"\t{fromfiledate}" if fromfiledate else ""
+			todate = f"\t{tofiledate}" if tofiledate else ""
+			yield f"--- {fromfile}{fromdate}{lineterm}"
+			yield f"+++ {tofile}{todate}{lineterm}"
+
+		first, last = group[0], group[-1]
+		file1_range = _format_range(first[1], last[2])
+		file2_range = _format_range(first[3], last[4])
+		yield f"@@ -{file1_range} +{file2_range} @@{lineterm}"
+
+		for tag, i1, i2, j1, j2 in group:
+			if tag == "equal":
+				for line in a[i1:i2]:
+					yield " " + line
+				continue
+			if tag in ("replace", "delete"):
+				for line in a[i1:i2]:
+					yield "-" + line
+			if tag in ("replace", "insert"):
+				for line in b[j1:j2]:
+					yield "+" + line
+
+
+def get_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+	"""
+	Edit script in difflib.SequenceMatcher.get_opcodes() form.
+	"""
+	ids: Dict[str, int] = {}
+	ha = [ids.setdefault(line, len(ids)) for line in a]
+	hb = [ids.setdefault(line, len(ids)) for line in b]
+
+	opcodes: List[Opcode] = []
+	i = j = 0
+	for ai, bj, size in _matching_blocks(ha, hb):
+		tag = ""
+		if i < ai and j < bj:
+			tag = "replace"
+		elif i < ai:
+			tag = "delete"
+		elif j < bj:
+			tag = "insert"
+		if tag:
+			opcodes.append((tag, i, ai, j, bj))
+		i, j = ai + size, bj + size
+		if size:
+			opcodes.append(("equal", ai, i, bj, j))
+	return opcodes
+
+
+def _matching_blocks(a: List[int], b: List[int]) -> List[Tuple[int, int, int]]:
+	"""
+	Maximal runs of equal lines as (i, j, size), in order, ending with the
+	(len(a), len(b), 0) sentinel like SequenceMatcher.get_matching_blocks().
+	"""
+	pairs: List[Tuple[int, int]] = []
+	# Explicit stack of half-open regions (a_lo, a_hi, b_lo, b_hi)
+	stack = [(0, len(a), 0, len(b))]
+	while stack:
+		a_lo, a_hi, b_lo, b_hi = stack.pop()
+
+		# Common prefix / suffix
+		while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+			pairs.append((a_lo, b_lo))
+			a_lo += 1
+			b_lo += 1
+		while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+			a_hi -= 1
+			b_hi -= 1
+			pairs.append((a_hi, b_hi))
+		if a_lo == a_hi or b_lo == b_hi:
+			continue
+
+		anchors = _unique_anchors(a, a_lo, a_hi, b, b_lo, b_hi)
+		if anchors:
+			prev_a, prev_b = a_lo, b_lo
+			for ai, bj in anchors:
+				stack.append((prev_a, ai, prev_b, bj))
+				pairs.append((ai, bj))
+				prev_a, prev_b = ai + 1, bj + 1
+			stack.append((prev_a, a_hi, prev_b, b_hi))
+			continue
+
+		# Small anchorless gaps: exact shortest edit script
+		if a_hi - a_lo + b_hi - b_lo <= MYERS_MAX_LINES:
+			found = _myers(a, a_lo, a_hi, b, b_lo, b_hi, MYERS_MAX_EDITS)
+			if found is not None:
+				pairs.extend(found)
+				continue
+
+		# Otherwise split around the longest run through the rarest shared line
+		match = _rare_line_match(a, a_lo, a_hi, b, b_lo, b_hi)
+		if match:
+			ma, mb, size = match
+			pairs.extend((ma + k, mb + k) for k in range(size))
+			stack.append((a_lo, ma, b_lo, mb))
+			stack.append((ma + size, a_hi, mb + size, b_hi))
+		# no shared lines at all: the gap is one replace
+
+	pairs.sort()
+	blocks: List[Tuple[int, int, int]] = []
+	for i, j in pairs:
+		if blocks:
+			bi, bj, size = blocks[-1]
+			if bi + size == i and bj + size == j:
+				blocks[-1] = (bi, bj, size + 1)
+				continue
+		blocks.append((i, j, 1))
+	blocks.append((len(a), len(b), 0))
+	return blocks
+
+
+def _unique_anchors(a: List[int], a_lo: int, a_hi: int,
+					b: List[int], b_lo: int, b_hi: int) -> List[Tuple[int, int]]:
+	"""
+	Lines occurring exactly once in each region, reduced to the longest
+	subsequence that is increasing on both sides.
+	"""
+	count_a: Dict[int, int] = {}
+	pos_a: Dict[int, int] = {}
+	for i in range(a_lo, a_hi):
+		x = a[i]
+		count_a[x] = count_a.get(x, 0) + 1
+		pos_a[x] = i
+	count_b: Dict[int, int] = {}
+	pos_b: Dict[int, int] = {}
+	for j in range(b_lo, b_hi):
+		x = b[j]
+		count_b[x] = count_b.get(x, 0) + 1
+		pos_b[x] = j
+
+	candidates = sorted(
+		(pos_a[x], pos_b[x]) for x, c in count_a.items()
+		if c == 1 and count_b.get(x) == 1
+	)
+	if not candidates:
+		return []
+
+	# Longest increasing subsequence on b positions (patience sorting)
+	tails: List[int] = []
+	tail_idx: List[int] = []
+	prev: List[int] = [-1] * len(candidates)
+	for idx, (_, bj) in enumerate(candidates):
+		k = bisect_left(tails, bj)
+		if k == len(tails):
+			tails.append(bj)
+			tail_idx.append(idx)
+		else:
+			tails[k] = bj
+			tail_idx[k] = idx
+		prev[idx] = tail_idx[k - 1] if k else -1
+	out: List[Tuple[int, int]] = []
+	idx = tail_idx[-1]
+	while idx != -1:
+		out.append(candidates[idx])
+		idx = prev[idx]
+	out.reverse()
+	return out
+
+
+def _rare_line_match(a: List[int], a_lo: int, a_hi: int,
+					 b: List[int], b_lo: int, b_hi: int) -> Tuple[int, int, int]:
+	"""
+	Find the least frequent line of the a-region that also occurs in the
+	b-region, and return the longest common run (i, j, size) through any
+	pair of its occurrences. Returns () if there is no usable line.
+	"""
+	occ: Dict[int, List[int]] = {}
+	for i in range(a_lo, a_hi):
+		occ.setdefault(a[i], []).append(i)
+
+	rarest = None
+	for j in range(b_lo, b_hi):
+		positions = occ.get(b[j])
+		if positions and (rarest is None or len(positions) < len(occ[rarest])):
+			rarest = b[j]
+	if rarest is None or len(occ[rarest]) > RARE_LINE_MAX_COUNT:
+		return ()
+
+	best = (0, 0, 0)
+	for j in range(b_lo, b_hi):
+		if b[j] != rarest:
+			continue
+		for i in occ[rarest]:
+			s_a, s_b = i, j
+			while s_a > a_lo and s_b > b_lo and a[s_a - 1] == b[s_b - 1]:
+				s_a -= 1
+				s_b -= 1
+			e_a, e_b = i + 1, j + 1
+			while e_a < a_hi and e_b < b_hi and a[e_a] == b[e_b]:
+				e_a += 1
+				e_b += 1
+			if e_a - s_a > best[2]:
+				best = (s_a, s_b, e_a - s_a)
+	return best
+
+
+def _myers(a: List[int], a_lo: int, a_hi: int, b: List[int], b_lo: int, b_hi: int,
+		   max_edits: int) -> Optional[List[Tuple[int, int]]]:
+	"""
+	Matched (i, j) pairs of a shortest edit script between the regions, or
+	None if that script needs more than `max_edits` edits.
+	"""
+	n, m = a_hi - a_lo, b_hi - b_lo
+	max_d = min(n + m, max_edits)
+	off = max_d + 1
+	v = [0] * (2 * max_d + 3)
+	trace: List[List[int]] = []
+	found = -1
+	for d in range(max_d + 1):
+		for k in range(-d, d + 1, 2):
+			if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+				x = v[off + k + 1]
+			else:
+				x = v[off + k - 1] + 1
+			y = x - k
+			while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+				x += 1
+				y += 1
+			v[off + k] = x
+			if x >= n and y >= m:
+				found = d
+		trace.append(v[off - d:off + d + 1])
+		if found >= 0:
+			break
+	if found < 0:
+		return None
+
+	pairs: List[Tuple[int, int]] = []
+	x, y = n, m
+	for d in range(found, 0, -1):
+		prev_v = trace[d - 1]
+		k = x - y
+		if k == -d or (k != d and prev_v[k - 1 + d - 1] < prev_v[k + 1 + d - 1]):
+			prev_k = k + 1
+		else:
+			prev_k = k - 1
+		prev_x = prev_v[prev_k + d - 1]
+		prev_y = prev_x - prev_k
+		# point right after the single insert/delete step
+		mid_x, mid_y = (prev_x, prev_y + 1) if prev_k == k + 1 else (prev_x + 1, prev_y)
+		while x > mid_x and y > mid_y:
+			x -= 1
+			y -= 1
+			pairs.append((a_lo + x, b_lo + y))
+		x, y = prev_x, prev_y
+	while x > 0 and y > 0:
+		x -= 1
+		y -= 1
+		pairs.append((a_lo + x, b_lo + y))
+	return pairs
+
+
+def _group_opcodes(codes: List[Opcode], n: int = 3) -> Iterator[List[Opcode]]:
+	"""
+	Same hunk grouping as difflib.SequenceMatcher.get_grouped_opcodes().
+	"""
+	if not codes:
+		codes = [("equal", 0, 1, 0, 1)]
+	codes = list(codes)
+	# Fixup leading and trailing groups if they show no changes.
+	if codes[0][0] == "equal":
+		tag, i1, i2, j1, j2 = codes[0]
+		codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+	if codes[-1][0] == "equal":
+		tag, i1, i2, j1, j2 = codes[-1]
+		codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+	nn = n + n
+	group: List[Opcode] = []
+	for tag, i1, i2, j1, j2 in codes:
+		# End the current group and start a new one whenever
+		# there is a large range with no changes.
+		if tag == "equal" and i2 - i1 > nn:
+			group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+			yield group
+			group = []
+			i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+		group.append((tag, i1, i2, j1, j2))
+	if group and not (len(group) == 1 and group[0][0] == "equal"):
+		yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+	"""Convert a range to the "ed" format used in unified diff hunk headers."""
+	beginning = start + 1   # lines start numbering with one
+	length = stop - start
+	if length == 1:
+		return f"{beginning}"
+	if not length:
+		beginning -= 1        # empty ranges begin at line just before the range
+	return f"{beginning},{length}"
@@ -0,0 +1,191 @@
+# aias/utils/fswalk.py
+
+"""
+Pruning directory walker shared by the code-analysis commands.
+Excluded directories are skipped before they are descended into, and
+files are yielded one at a time so callers can start work immediately.
+`update_file_cache` re-analyses only the walked files whose content changed.
+"""
+
+import fnmatch
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Skipped unless the caller passes its own list
+DEFAULT_EXCLUDES = [
+    ".*",
+    "venv",
+    "site-packages",
+    "node_modules",
+    "__pycache__",
+    "build",
+    "dist",
+    "*.egg-info",
+]
+
+# Below this many changed files, update_file_cache analyses serially
+POOL_MIN_FILES = 32
+
+# (pattern, negated, dir_only, anchored, base) where base is the directory
+# (relative to the walk root, "" for the root) whose .gitignore it came from
+_Rule = Tuple[str, bool, bool, bool, str]
+
+
+def _parse_rules(lines: Iterable[str], base: str = "") -> List[_Rule]:
+    rules: List[_Rule] = []
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.strip("/") if dir_only else line
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line:
+            rules.append((line, negated, dir_only, anchored, base))
+    return rules
+
+
+def _read_gitignore(dirpath: str, base: str) -> List[_Rule]:
+    try:
+        with open(os.path.join(dirpath, ".gitignore"), encoding="utf-8", errors="ignore") as f:
+            return _parse_rules(f, base)
+    except OSError:
+        return []
+
+
+def _excluded(rel_path: str, is_dir: bool, rules: List[_Rule]) -> bool:
+    """
+    Apply rules in order; the last matching rule wins, as in .gitignore.
+    """
+    name = rel_path.rsplit("/", 1)[-1]
+    excluded = False
+    for pattern, negated, dir_only, anchored, base in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + "/"):
+                continue
+            target = rel_path[len(base) + 1:]
+        else:
+            target = rel_path
+        if anchored:
+            hit = fnmatch.fnmatch(target, pattern)
+        else:
+            hit = fnmatch.fnmatch(name, pattern)
+        if hit:
+            excluded = not negated
+    return excluded
+
+
+def walk_files(
+    root: Path,
+    suffixes: Optional[Iterable[str]] = (".py",),
+    exclude: Optional[Iterable[str]] = None,
+    respect_gitignore: bool = True,
+) -> Iterator[Path]:
+    """
+    Yield files under `root` whose suffix is in `suffixes` (every file if
+    None), lazily.
+    `exclude` is a list of .gitignore-style globs (default DEFAULT_EXCLUDES);
+    matching directories are pruned without being listed. When
+    `respect_gitignore` is set, every .gitignore found on the way down
+    applies to its own subtree.
+    """
+    root = Path(root)
+    suffixes = tuple(suffixes) if suffixes is not None else None
+    base_rules = _parse_rules(DEFAULT_EXCLUDES if exclude is None else exclude)
+
+    # Depth-first stack of (absolute dir, dir relative to root, active rules)
+    root_rules = base_rules + (_read_gitignore(str(root), "") if respect_gitignore else [])
+    stack = [(str(root), "", root_rules)]
+    while stack:
+        dirpath, rel_dir, rules = stack.pop()
+        try:
+            entries = sorted(os.scandir(dirpath), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if _excluded(rel, is_dir, rules):
+                continue
+            if is_dir:
+                subdirs.append((entry.path, rel))
+            elif suffixes is None or entry.name.endswith(suffixes):
+                yield Path(entry.path)
+
+        # Push in reverse so directories are visited in sorted order
+        for path, rel in reversed(subdirs):
+            child_rules = rules + _read_gitignore(path, rel) if respect_gitignore else rules
+            stack.append((path, rel, child_rules))
+
+
+def update_file_cache(
+    root: Path,
+    files: Iterable[Path],
+    cached: Dict[str, Dict[str, Any]],
+    analyze: Callable[[str], Any],
+    pool_min_files: int = POOL_MIN_FILES,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Bring a per-file cache up to date with `files`. `cached` maps paths
+    relative to `root` (posix style) to {"hash", "mtime_ns", "size",
+    "result"}; an unchanged mtime and size skips even the sha1. Files whose
+    content changed get result = analyze(source), on a process pool when
+    there are at least `pool_min_files` of them, so `analyze` must be a
+    module-level function. Returns (entries for the files seen, in walk
+    order, and the relative paths that were re-analysed); entries for
+    files that are gone are dropped.
+    """
+    root = Path(root)
+    fresh: Dict[str, Dict[str, Any]] = {}
+    stale: List[Tuple[str, str, str, int, int]] = []
+    for f in files:
+        rel_path = f.relative_to(root).as_posix()
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        entry = cached.get(rel_path)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            fresh[rel_path] = entry
+            continue
+        try:
+            raw = f.read_bytes()
+        except OSError:
+            continue
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry and entry["hash"] == digest:
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            fresh[rel_path] = entry
+            continue
+        stale.append((rel_path, raw.decode("utf-8", errors="ignore"), digest, st.st_mtime_ns, st.st_size))
+
+    sources = [src for _, src, _, _, _ in stale]
+    for (rel_path, _, digest, mtime_ns, size), result in zip(stale, _analyze_all(analyze, sources, pool_min_files)):
+        fresh[rel_path] = {"hash": digest, "mtime_ns": mtime_ns, "size": size, "result": result}
+    return fresh, [rel_path for rel_path, *_ in stale]
+
+
+def _analyze_all(analyze: Callable[[str], Any], sources: List[str], pool_min_files: int) -> List[Any]:
+    # In-process for a few files, where pool start-up would dominate
+    if len(sources) < pool_min_files:
+        return [analyze(src) for src in sources]
+    try:
+        with ProcessPoolExecutor() as pool:
+            return list(pool.map(analyze, sources, chunksize=16))
+    except Exception:
+        # e.g. no multiprocessing support in this interpreter
+        return [analyze(src) for src in sources]
@@ -1,6 +1,11 @@
 from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification, AutoModelForSeq2SeqLM
 import torch
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
 from sentence_transformers import SentenceTransformer
 model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
@@ -8,6 +13,10 @@ model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 INTENT_MODEL = "distilbert-base-uncased"
 GEN_MODEL = "facebook/bart-base"
 
+# Micro-batching limits: flush after this many items or this long, whichever first
+BATCH_MAX_ITEMS = 32
+BATCH_MAX_WAIT_MS = 5.0
+
 # Lazy-load pipelines
 _classifier = None
 _generator = None
@@ -32,10 +41,173 @@ def load_generator_pipeline():
         )
     return _generator
 
-def classify_intent(text: str) -> str:
+# ─── Micro-batching Service ───────────────────────────────────────────────────
+
+class MicroBatcher:
+    """
+    Collect single-item requests from many threads and run them through
+    `batch_fn` as one batch. A batch is flushed once it holds `max_batch`
+    items or its first request has waited `max_wait_ms`.
+    `batch_fn` takes a list of items and returns a list of results in order.
+    """
+
+    def __init__(self,
+                 batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch: int = BATCH_MAX_ITEMS,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS,
+                 name: str = "micro-batcher"):
+        self._batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+
+        # Metrics
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._last_batch = 0
+        self._max_batch_seen = 0
+        self._max_depth_seen = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue one item and return a Future that resolves to its result.
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        with self._lock:
+            self._max_depth_seen = max(self._max_depth_seen, self._queue.qsize())
+        return fut
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Blocking convenience wrapper around submit().
+        """
+        return self.submit(item).result(timeout)
+
+    def close(self) -> None:
+        """
+        Stop accepting work; requests already queued are still served.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return queue-depth and batch-size counters.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth_seen,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "last_batch_size": self._last_batch,
+                "max_batch_size": self._max_batch_seen,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Any]) -> None:
+        # drop requests whose callers already cancelled
+        live = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            results = list(self._batch_fn([item for item, _ in live]))
+            if len(results) != len(live):
+                raise RuntimeError(
+                    f"{self._thread.name}: batch_fn returned {len(results)} results for {len(live)} inputs"
+                )
+            for (_, fut), res in zip(live, results):
+                fut.set_result(res)
+        except Exception as e:
+            for _, fut in live:
+                if not fut.done():
+                    fut.set_exception(e)
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(live)
+            self._last_batch = len(live)
+            self._max_batch_seen = max(self._max_batch_seen, len(live))
+
+def _embed_batch(texts: List[str]) -> List[Any]:
+    embs = model.encode(texts, batch_size=len(texts))
+    return list(embs)
+
+def _intent_batch(texts: List[str]) -> List[str]:
     clf = load_intent_pipeline()
-    result = clf(text, truncation=True)
-    return result[0]["label"]
+    results = clf(texts, truncation=True)
+    return [r["label"] for r in results]
+
+_embed_batcher: Optional[MicroBatcher] = None
+_intent_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+def get_embed_batcher() -> MicroBatcher:
+    global _embed_batcher
+    with _batcher_lock:
+        if _embed_batcher is None:
+            _embed_batcher = MicroBatcher(_embed_batch, name="embed-batcher")
+    return _embed_batcher
+
+def get_intent_batcher() -> MicroBatcher:
+    global _intent_batcher
+    with _batcher_lock:
+        if _intent_batcher is None:
+            _intent_batcher = MicroBatcher(_intent_batch, name="intent-batcher")
+    return _intent_batcher
+
+def embed_async(text: str) -> Future:
+    """
+    Queue `text` for the next batched encoder pass; resolves to its embedding.
+    """
+    return get_embed_batcher().submit(text)
+
+def embed(text: str):
+    return embed_async(text).result()
+
+def batching_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Metrics for every batcher that has been started.
+    """
+    out = {}
+    if _embed_batcher is not None:
+        out["embed"] = _embed_batcher.metrics()
+    if _intent_batcher is not None:
+        out["intent"] = _intent_batcher.metrics()
+    return out
+
+def classify_intent(text: str) -> str:
+    return get_intent_batcher()(text)
 
 def generate_response(prompt: str, max_tokens=150) -> str:
     gen = load_generator_pipeline()
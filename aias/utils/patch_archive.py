@@ -0,0 +1,127 @@
+# aias/utils/patch_archive.py
+
+"""
+Content-addressed store for patch notes and proposed rewrites.
+
+Everything lives in one SQLite file instead of a loose file per proposal:
+bodies are zlib-compressed and keyed by their SHA-256, so identical diffs
+are stored once, and an index on (path, created) answers "history of
+agent.py" or "last N patches" without scanning anything.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ARCHIVE_PATH = Path("memory/patch_archive.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash    TEXT NOT NULL REFERENCES blobs(hash),
+    path    TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_path_created ON notes(path, created);
+CREATE INDEX IF NOT EXISTS notes_created ON notes(created);
+"""
+
+
+class PatchArchive:
+    """
+    Thread-safe handle on the archive. `kind` tags what was stored, e.g.
+    "diff" for patch notes or "proposal" for a full-file LLM rewrite.
+    """
+
+    def __init__(self, path: Path = ARCHIVE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def add(self, path: str, content: str, kind: str = "diff") -> str:
+        """
+        Store `content` for `path` and return its hash. A body already in
+        the archive is not stored again; only a new index row is added.
+        """
+        raw = content.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO blobs(hash, data) VALUES (?, ?)",
+                (digest, zlib.compress(raw, 6)),
+            )
+            self._db.execute(
+                "INSERT INTO notes(hash, path, kind, created) VALUES (?, ?, ?, ?)",
+                (digest, _norm(path), kind, time.time()),
+            )
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """
+        Return the stored body for a full hash or unique prefix, or None.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM blobs WHERE hash >= ? AND hash < ? LIMIT 2",
+                (digest, digest + "g"),
+            ).fetchall()
+        if len(rows) != 1:
+            return None
+        return zlib.decompress(rows[0][0]).decode("utf-8")
+
+    def history(self, path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Entries recorded for `path`, newest first.
+        """
+        sql = "SELECT id, hash, path, kind, created FROM notes WHERE path = ? ORDER BY created DESC"
+        return self._query(sql, (_norm(path),), limit)
+
+    def last(self, n: int = 10) -> List[Dict[str, Any]]:
+        """
+        The `n` most recent entries across all files, newest first.
+        """
+        sql = "SELECT id, hash, path, kind, created FROM notes ORDER BY created DESC"
+        return self._query(sql, (), n)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _query(self, sql: str, params: tuple, limit: Optional[int]) -> List[Dict[str, Any]]:
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + (int(limit),)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        keys = ("id", "hash", "path", "kind", "created")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def _norm(path: str) -> str:
+    return str(path).replace("\\", "/")
+
+
+_archive: Optional[PatchArchive] = None
+_archive_lock = threading.Lock()
+
+def get_archive() -> PatchArchive:
+    """
+    Process-wide archive at ARCHIVE_PATH, opened on first use.
+    """
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = PatchArchive()
+    return _archive
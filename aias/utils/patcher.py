@@ -1,10 +1,19 @@
 import os
-from datetime import datetime
-import difflib
+import hashlib
+import shutil
+import tempfile
+import threading
 import yaml
 
+from aias.utils.fastdiff import unified_diff
+from aias.utils.patch_archive import get_archive
+
 CONFIG = None
 
+# abs path → (mtime_ns, size, content hash), so unchanged files aren't re-read
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
 def load_config_if_needed():
 	global CONFIG
 	if CONFIG is None:
@@ -13,58 +22,192 @@ def load_config_if_needed():
 
 
 def generate_patch_note(old_content, new_content, file_path):
+	"""
+	Diff old vs new content and store it in the patch archive.
+	Returns the archive hash of the diff.
+	"""
 	load_config_if_needed()
 
-	timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-	patch_file = f"memory/patch_notes/{os.path.basename(file_path)}_{timestamp}.patch"
-
-	diff = difflib.unified_diff(
+	# Same output as difflib.unified_diff; large rewrites use a linear-time engine
+	diff = unified_diff(
 		old_content.splitlines(keepends=True),
 		new_content.splitlines(keepends=True),
 		fromfile=f"{file_path} (old)",
 		tofile=f"{file_path} (new)"
 	)
 
-	with open(patch_file, "w", encoding="utf-8") as f:
-		f.writelines(diff)
-
-	print(f"📝 Patch note saved: {patch_file}")
-	return patch_file
-
-
-def safe_update_file(file_path, new_content):
+	digest = get_archive().add(file_path, "".join(diff), kind="diff")
+	print(f"📝 Patch note archived: {digest[:12]} ({file_path})")
+	return digest
+
+
+def _content_hash(text):
+	# Hash of the stripped text, so leading/trailing whitespace alone is "no change"
+	return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def _file_hash(file_path):
+	"""
+	Content hash of the file on disk, reused while its mtime and size are
+	unchanged. A missing file hashes like empty content.
+	"""
+	try:
+		st = os.stat(file_path)
+	except FileNotFoundError:
+		return _content_hash("")
+	key = os.path.abspath(file_path)
+	with _hash_lock:
+		cached = _hash_cache.get(key)
+	if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+		return cached[2]
+	# Universal newlines, so a CRLF file matches the same text with LF
+	with open(file_path, "r", encoding="utf-8") as f:
+		digest = _content_hash(f.read())
+	with _hash_lock:
+		_hash_cache[key] = (st.st_mtime_ns, st.st_size, digest)
+	return digest
+
+
+def _remember_hash(file_path, content):
+	st = os.stat(file_path)
+	with _hash_lock:
+		_hash_cache[os.path.abspath(file_path)] = (st.st_mtime_ns, st.st_size, _content_hash(content))
+
+
+def _read_text(file_path):
+	if not os.path.exists(file_path):
+		return None
+	with open(file_path, "r", encoding="utf-8") as f:
+		return f.read()
+
+
+def _read_bytes(file_path):
+	if not os.path.exists(file_path):
+		return None
+	with open(file_path, "rb") as f:
+		return f.read()
+
+
+def _stage(file_path, content):
+	"""
+	Write `content` to a fsynced temp file next to `file_path` and return
+	its path. Nothing visible changes until it is renamed into place.
+	Text is written with the platform's newlines, bytes exactly as given.
+	"""
+	directory = os.path.dirname(os.path.abspath(file_path))
+	fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+	try:
+		if isinstance(content, bytes):
+			f = os.fdopen(fd, "wb")
+		else:
+			f = os.fdopen(fd, "w", encoding="utf-8")
+		with f:
+			f.write(content)
+			f.flush()
+			os.fsync(f.fileno())
+		if os.path.exists(file_path):
+			shutil.copymode(file_path, tmp)
+	except BaseException:
+		os.unlink(tmp)
+		raise
+	return tmp
+
+
+def _fsync_dir(file_path):
+	# Make the rename itself durable; not supported on Windows
+	try:
+		fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY)
+	except OSError:
+		return
+	try:
+		os.fsync(fd)
+	except OSError:
+		pass
+	finally:
+		os.close(fd)
+
+
+def _atomic_write(file_path, content):
+	os.replace(_stage(file_path, content), file_path)
+	_fsync_dir(file_path)
+
+
+def safe_update_files(updates):
+	"""
+	Apply {file_path: new_content} as one transaction: either every changed
+	file is replaced or none is. Each file is written to a fsynced temp file
+	first and then atomically renamed over the original; if any step fails,
+	files already replaced are restored to their previous content.
+	Returns True if the batch was applied (or nothing needed changing).
+	"""
 	load_config_if_needed()
 
 	# Check extension restrictions
-	ext = os.path.splitext(file_path)[1].lower()
-	if ext in CONFIG["access"]["restricted_extensions"]:
-		print(f"🚫 Write blocked (restricted extension): {file_path}")
-		return False
-
-	# Read current content
-	old_content = ""
-	if os.path.exists(file_path):
-		with open(file_path, "r", encoding="utf-8") as f:
-			old_content = f.read()
+	for file_path in updates:
+		ext = os.path.splitext(file_path)[1].lower()
+		if ext in CONFIG["access"]["restricted_extensions"]:
+			print(f"🚫 Write blocked (restricted extension): {file_path}")
+			return False
 
 	# If content is identical, skip
-	if old_content.strip() == new_content.strip():
-		print(f"🔄 No change needed: {file_path}")
+	changed = {}
+	for file_path, new_content in updates.items():
+		if _file_hash(file_path) == _content_hash(new_content):
+			print(f"🔄 No change needed: {file_path}")
+		else:
+			changed[file_path] = new_content
+	if not changed:
 		return True
 
-	# Create patch note
-	patch_path = generate_patch_note(old_content, new_content, file_path)
+	# Create patch notes; keep the exact bytes of each original for rollback
+	originals = {}
+	for file_path, new_content in changed.items():
+		originals[file_path] = _read_bytes(file_path)
+		generate_patch_note(_read_text(file_path) or "", new_content, file_path)
 
 	# If patch approval is required
 	if CONFIG["modes"].get("patch_approval", True):
-		confirm = input(f"❓ Approve changes to {file_path}? (y/n): ").strip().lower()
+		target = next(iter(changed)) if len(changed) == 1 else f"{len(changed)} files ({', '.join(changed)})"
+		confirm = input(f"❓ Approve changes to {target}? (y/n): ").strip().lower()
 		if confirm != "y":
 			print("❌ Patch rejected by user.")
 			return False
 
+	# Stage every file before touching any of them
+	staged = {}
+	try:
+		for file_path, new_content in changed.items():
+			staged[file_path] = _stage(file_path, new_content)
+	except Exception as e:
+		for tmp in staged.values():
+			os.unlink(tmp)
+		print(f"❌ Could not stage update: {e}")
+		return False
+
 	# Apply patch
-	with open(file_path, "w", encoding="utf-8") as f:
-		f.write(new_content)
+	applied = []
+	try:
+		for file_path, tmp in staged.items():
+			os.replace(tmp, file_path)
+			applied.append(file_path)
+			_fsync_dir(file_path)
+	except Exception as e:
+		for file_path in applied:
+			if originals[file_path] is None:
+				os.remove(file_path)
+			else:
+				_atomic_write(file_path, originals[file_path])
+		for file_path, tmp in staged.items():
+			if file_path not in applied and os.path.exists(tmp):
+				os.unlink(tmp)
+		print(f"❌ Update failed, rolled back {len(applied)} file(s): {e}")
+		return False
 
-	print(f"✅ File updated: {file_path}")
+	for file_path in applied:
+		_remember_hash(file_path, changed[file_path])
+		print(f"✅ File updated: {file_path}")
 	return True
+
+
+def safe_update_file(file_path, new_content):
+	return safe_update_files({file_path: new_content})
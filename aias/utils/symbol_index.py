@@ -0,0 +1,212 @@
+# aias/utils/symbol_index.py
+
+"""
+Persistent index of where Python names are defined.
+
+Every .py file under the root is parsed with `ast` once; the module, its
+classes, functions, methods and module/class-level assignments are stored
+with their line numbers in memory/symbol_index.json. Later refreshes only
+re-parse files whose content hash changed (fswalk.update_file_cache), so
+"where is X" is a dict lookup; lookups re-scan the tree in the background.
+"""
+
+import ast
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from aias.utils.fswalk import update_file_cache, walk_files
+
+INDEX_PATH = Path("memory/symbol_index.json")
+INDEX_VERSION = 2
+# A lookup starts a background re-scan when the index is older than this (seconds)
+REFRESH_INTERVAL = 5.0
+
+# (name, kind, line, qualname)
+Symbol = Tuple[str, str, int, str]
+
+
+def _module_name(rel_path: str) -> str:
+    parts = Path(rel_path).with_suffix("").parts
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _assigned_names(node: ast.AST) -> List[str]:
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    names = []
+    for t in targets:
+        elts = t.elts if isinstance(t, (ast.Tuple, ast.List)) else [t]
+        names.extend(e.id for e in elts if isinstance(e, ast.Name))
+    return names
+
+
+def extract_symbols(src: str, rel_path: str = "") -> List[Symbol]:
+    """
+    Definitions in one file's source. Module-level so it can run in a
+    worker process. A file that doesn't parse contributes only its module.
+    """
+    module = _module_name(rel_path) if rel_path else ""
+    symbols: List[Symbol] = []
+    if module:
+        symbols.append((module.rsplit(".", 1)[-1], "module", 1, module))
+    try:
+        tree = ast.parse(src)
+    except (SyntaxError, ValueError):
+        return symbols
+
+    def visit(body: Iterable[ast.stmt], prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                qual = prefix + node.name
+                symbols.append((node.name, "class", node.lineno, qual))
+                visit(node.body, qual + ".", True)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qual = prefix + node.name
+                symbols.append((node.name, "method" if in_class else "function", node.lineno, qual))
+                visit(node.body, qual + ".", False)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and (in_class or not prefix):
+                for name in _assigned_names(node):
+                    symbols.append((name, "attribute" if in_class else "variable", node.lineno, prefix + name))
+            elif isinstance(node, (ast.If, ast.Try, ast.With)) and not prefix:
+                # Module-level definitions behind `if TYPE_CHECKING:`, try/except imports, ...
+                for block in ("body", "orelse", "finalbody"):
+                    visit(getattr(node, block, []), prefix, in_class)
+                for handler in getattr(node, "handlers", []):
+                    visit(handler.body, prefix, in_class)
+
+    visit(tree.body, "", False)
+    return symbols
+
+
+def _parse_source(src: str) -> List[Symbol]:
+    # Module entries depend on the path, so SymbolIndex adds them itself
+    return extract_symbols(src)
+
+
+class SymbolIndex:
+    """
+    Symbol table for the .py files under `root`. Thread-safe; a lookup
+    answers from the current index and, if that is older than
+    `refresh_interval`, starts one background refresh for later lookups.
+    """
+
+    def __init__(self, root: Path, path: Path = INDEX_PATH,
+                 exclude: Optional[Iterable[str]] = None,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.root = Path(root)
+        self.path = Path(path)
+        self.exclude = exclude
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()   # held while a background refresh runs
+        self._files: Dict[str, Dict[str, Any]] = self._load()
+        self._by_name: Dict[str, List[Tuple[str, Symbol]]] = {}
+        self._refreshed = 0.0
+        self._rebuild_lookup()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == INDEX_VERSION and data.get("root") == str(self.root.resolve()):
+                return data["files"]
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "version": INDEX_VERSION,
+            "root": str(self.root.resolve()),
+            "files": self._files,
+        }), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _rebuild_lookup(self) -> None:
+        by_name: Dict[str, List[Tuple[str, Symbol]]] = {}
+        for rel_path, entry in self._files.items():
+            module = _module_name(rel_path)
+            syms = [(module.rsplit(".", 1)[-1], "module", 1, module)] if module else []
+            for sym in syms + entry["result"]:
+                sym = tuple(sym)
+                name, _, _, qual = sym
+                by_name.setdefault(name.lower(), []).append((rel_path, sym))
+                if qual != name:
+                    by_name.setdefault(qual.lower(), []).append((rel_path, sym))
+        self._by_name = by_name
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the tree; returns how many files
+        were (re)parsed.
+        """
+        with self._lock:
+            files = walk_files(self.root, (".py",), self.exclude)
+            fresh, parsed = update_file_cache(self.root, files, self._files, _parse_source)
+            changed = bool(parsed) or len(fresh) != len(self._files)
+            self._files = fresh
+            self._refreshed = time.monotonic()
+            if changed:
+                self._rebuild_lookup()
+                self._save()
+            return len(parsed)
+
+    def refresh_in_background(self) -> bool:
+        """
+        Start refresh() on a daemon thread unless one is already running.
+        Returns whether a refresh was started.
+        """
+        if not self._refreshing.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Symbol index refresh failed: {e}")
+            finally:
+                self._refreshing.release()
+
+        threading.Thread(target=run, name="symbol-index", daemon=True).start()
+        return True
+
+    def lookup(self, name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Definitions of `name` (a plain name or a dotted qualname such as
+        "ConversationContext.prompt_parts"), exact-case matches first.
+        Returns [{"name", "kind", "file", "line", "qualname"}].
+        """
+        if not self._files and not self._refreshed:
+            # Nothing saved from an earlier run to answer from
+            self.refresh()
+        elif time.monotonic() - self._refreshed > self.refresh_interval:
+            self.refresh_in_background()
+        hits = self._by_name.get(name.lower(), [])
+        hits = sorted(hits, key=lambda h: (name not in (h[1][0], h[1][3]), h[0], h[1][2]))
+        return [
+            {"name": sym[0], "kind": sym[1], "file": rel_path, "line": sym[2], "qualname": sym[3]}
+            for rel_path, sym in hits[:limit]
+        ]
+
+
+_index: Optional[SymbolIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index(root: Optional[Path] = None) -> SymbolIndex:
+    """
+    Process-wide index of `root` (the working directory by default),
+    opened on first use and reopened if the root changes.
+    """
+    global _index
+    root = Path(root or os.getcwd())
+    with _index_lock:
+        if _index is None or _index.root != root:
+            _index = SymbolIndex(root)
+    return _index
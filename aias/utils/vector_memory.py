@@ -0,0 +1,441 @@
+# aias/utils/vector_memory.py
+
+"""
+Long-term memory over past conversations.
+
+Every (user, ai) turn in memory/logs.jsonl is embedded once and appended
+to a flat float32 matrix on disk (memory/vector_memory/vectors.f32), read
+back through a memory map. Rows hold no text: offsets.i64 maps each row to
+the byte offset of its line in logs.jsonl, so a hit is one seek away.
+
+Small corpora are searched exactly with one matrix-vector product. Past
+IVF_MIN_ROWS rows an inverted-file index is trained (spherical k-means,
+~sqrt(n) lists) and a query only scans the `nprobe` closest lists, plus
+rows added since the lists were last sorted.
+
+The index follows the log: `log_interaction` calls `notify()`, and a
+background thread embeds whatever was appended since the last sync.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MEMORY_DIR = Path("memory/vector_memory")
+LOG_FILE = Path("memory/logs.jsonl")
+
+# Below this many rows exact search is fast enough (a few ms)
+IVF_MIN_ROWS = 50_000
+# Lists scanned per query; more lists, better recall, slower queries
+IVF_NPROBE = 16
+# Retrain the lists once the index has grown this much since training
+IVF_RETRAIN_GROWTH = 4
+# Rows added after the lists were sorted are scanned exactly up to this many
+IVF_MAX_PENDING = 20_000
+KMEANS_ITERS = 8
+KMEANS_SAMPLE_PER_LIST = 64
+
+SYNC_BATCH = 256
+EMBED_CHARS = 2000   # clip long turns before embedding
+HEAD_BYTES = 4096    # prefix of the log hashed to notice it was replaced
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    """
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def _assign(vecs: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    out = np.empty(len(vecs), dtype=np.int32)
+    for start in range(0, len(vecs), chunk):
+        out[start:start + chunk] = np.argmax(vecs[start:start + chunk] @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(sample: np.ndarray, nlist: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means: centroids are kept unit length, so nearest means
+    highest dot product, the same measure the search uses.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        present = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Append-only cosine-similarity index persisted in `directory`. Vectors
+    are normalized on the way in. Rows are numbered in insertion order.
+    Searches may run while another thread adds; adds must come from one
+    thread at a time.
+    """
+
+    def __init__(self, directory: Path, dim: int,
+                 ivf_min_rows: int = IVF_MIN_ROWS, nprobe: int = IVF_NPROBE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self._vec_path = self.directory / "vectors.f32"
+        self._ivf_path = self.directory / "ivf.npz"
+        self._assign_path = self.directory / "assign.i32"
+        self._lock = threading.Lock()
+
+        self._vectors = self._map()
+        # IVF state: centroids, per-row list ids, and the rows sorted by list
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._labels = np.empty(0, dtype=np.int32)
+        self._order = np.empty(0, dtype=np.int64)
+        self._starts = np.empty(0, dtype=np.int64)
+        self._sorted_rows = 0
+        self._load_ivf()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _map(self) -> np.ndarray:
+        rows = self._vec_path.stat().st_size // (4 * self.dim) if self._vec_path.exists() else 0
+        if rows == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def _load_ivf(self) -> None:
+        if not (self._ivf_path.exists() and self._assign_path.exists()):
+            return
+        with np.load(self._ivf_path) as data:
+            centroids = data["centroids"]
+            trained = int(data["trained_rows"])
+        labels = np.fromfile(self._assign_path, dtype=np.int32)
+        if centroids.shape[1] != self.dim or len(labels) > len(self):
+            return
+        if len(labels) < len(self):
+            # Crashed between the vector append and the label append
+            labels = np.concatenate((labels, _assign(self._vectors[len(labels):], centroids)))
+            labels.tofile(self._assign_path)
+        self._trained_rows, self._labels = trained, labels
+        self._sort_lists(centroids)
+
+    def _sort_lists(self, centroids: Optional[np.ndarray] = None) -> None:
+        """
+        Group rows by list. New centroids are published together with
+        their lists so a concurrent search never mixes the two.
+        """
+        centroids = self._centroids if centroids is None else centroids
+        labels = self._labels
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=len(centroids))
+        starts = np.concatenate(([0], np.cumsum(counts)))
+        with self._lock:
+            self._centroids = centroids
+            self._order, self._starts, self._sorted_rows = order, starts, len(labels)
+
+    def add(self, vecs: np.ndarray) -> None:
+        vecs = _normalize(np.atleast_2d(vecs))
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dim vectors, got {vecs.shape[1]}")
+        with self._lock:
+            # Drop the old map before the file grows under it (Windows)
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+            with open(self._vec_path, "ab") as f:
+                vecs.tofile(f)
+            self._vectors = self._map()
+
+        if self._centroids is not None:
+            new = _assign(vecs, self._centroids)
+            with open(self._assign_path, "ab") as f:
+                new.tofile(f)
+            self._labels = np.concatenate((self._labels, new))
+
+        rows = len(self)
+        if rows >= self.ivf_min_rows and (
+                self._centroids is None or rows >= self._trained_rows * IVF_RETRAIN_GROWTH):
+            self.train()
+        elif self._centroids is not None and rows - self._sorted_rows > IVF_MAX_PENDING:
+            self._sort_lists()
+
+    def train(self, seed: int = 0) -> None:
+        """
+        (Re)build the IVF lists from the current rows.
+        """
+        vectors = self._vectors
+        rows = len(vectors)
+        nlist = max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(seed)
+        take = min(rows, nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(rows, take, replace=False))])
+        centroids = _kmeans(sample, nlist, seed=seed)
+        labels = _assign(vectors, centroids)
+
+        np.savez(self._ivf_path, centroids=centroids, trained_rows=rows)
+        labels.tofile(self._assign_path)
+        self._trained_rows, self._labels = rows, labels
+        self._sort_lists(centroids)
+
+    def search(self, query: np.ndarray, k: int = 5, exact: bool = False) -> List[tuple]:
+        """
+        Return up to k (row, score) pairs, best first; score is cosine similarity.
+        """
+        q = _normalize(query).reshape(-1)
+        with self._lock:
+            vectors, centroids = self._vectors, self._centroids
+            order, starts, sorted_rows = self._order, self._starts, self._sorted_rows
+        if len(vectors) == 0:
+            return []
+
+        if exact or centroids is None:
+            scores = vectors @ q
+            return [(int(i), float(scores[i])) for i in _top_k(scores, k)]
+
+        probe = _top_k(centroids @ q, self.nprobe)
+        rows = np.concatenate(
+            [order[starts[c]:starts[c + 1]] for c in probe] +
+            [np.arange(sorted_rows, len(vectors))]
+        )
+        rows.sort()   # sequential reads through the memory map
+        scores = vectors[rows] @ q
+        return [(int(rows[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+
+class VectorMemory:
+    """
+    Past conversation turns searchable by meaning. `embed` maps a list of
+    texts to vectors; it defaults to the nlp_engine batcher.
+
+    The index remembers how far into logs.jsonl it has read and a hash of
+    the log's first bytes. If the log shrinks or its start changes (it was
+    cleaned or replaced), the index is rebuilt from scratch.
+    """
+
+    def __init__(self, directory: Path = MEMORY_DIR, log_path: Path = LOG_FILE,
+                 embed=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.log_path = Path(log_path)
+        self._embed = embed
+        self._meta_path = self.directory / "meta.json"
+        self._offsets_path = self.directory / "offsets.i64"
+        self._meta = self._load_meta()
+        self._index: Optional[VectorIndex] = None
+        self._offsets = np.fromfile(self._offsets_path, dtype=np.int64) \
+            if self._offsets_path.exists() else np.empty(0, dtype=np.int64)
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_meta(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self._meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_meta(self) -> None:
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._meta), encoding="utf-8")
+        os.replace(tmp, self._meta_path)
+
+    def _log_head(self, length: int) -> str:
+        with open(self.log_path, "rb") as f:
+            return hashlib.sha1(f.read(length)).hexdigest()
+
+    def _reset(self) -> None:
+        self._index = None
+        for name in ("vectors.f32", "offsets.i64", "ivf.npz", "assign.i32", "meta.json"):
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+        self._meta = {}
+        self._offsets = np.empty(0, dtype=np.int64)
+
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        if self._embed is not None:
+            return np.asarray(self._embed(texts), dtype=np.float32)
+        from aias.utils.nlp_engine import embed_async
+        futures = [embed_async(t) for t in texts]
+        return np.vstack([f.result() for f in futures]).astype(np.float32)
+
+    def _get_index(self, dim: int) -> VectorIndex:
+        if self._index is None:
+            self._index = VectorIndex(self.directory, dim)
+            self._meta["dim"] = dim
+        return self._index
+
+    def _open(self) -> None:
+        """
+        Open the index saved by an earlier run, or start over if it no
+        longer matches the log.
+        """
+        size = self.log_path.stat().st_size if self.log_path.exists() else 0
+        offset = self._meta.get("log_offset", 0)
+        head_len = self._meta.get("head_len", 0)
+        stale = size < offset
+        if head_len and not stale:
+            stale = self._meta.get("log_head") != self._log_head(head_len)
+        if stale:
+            self._reset()
+        if self._index is None and self._meta.get("dim"):
+            self._get_index(self._meta["dim"])
+            if len(self._index) != len(self._offsets):
+                # Interrupted between appends; re-read the log from the start
+                self._reset()
+
+    # ─── Syncing ──────────────────────────────────────────────────────
+
+    def sync(self) -> int:
+        """
+        Embed every complete line appended to the log since the last sync.
+        Returns the number of turns added.
+        """
+        with self._sync_lock:
+            if not self.log_path.exists():
+                return 0
+            self._open()
+            offset = self._meta.get("log_offset", 0)
+
+            added = 0
+            with open(self.log_path, "rb") as f:
+                f.seek(offset)
+                batch_offsets: List[int] = []
+                batch_texts: List[str] = []
+                pos = offset
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break   # still being written
+                    line_at, pos = pos, pos + len(raw)
+                    try:
+                        entry = json.loads(raw)
+                        text = f"{entry.get('user', '')}\n{entry.get('ai', '')}"
+                    except (json.JSONDecodeError, AttributeError):
+                        continue
+                    batch_offsets.append(line_at)
+                    batch_texts.append(text[:EMBED_CHARS])
+                    if len(batch_texts) >= SYNC_BATCH:
+                        added += self._append(batch_texts, batch_offsets, pos)
+                        batch_offsets, batch_texts = [], []
+                if batch_texts or pos != offset:
+                    added += self._append(batch_texts, batch_offsets, pos)
+            return added
+
+    def _append(self, texts: List[str], offsets: List[int], log_offset: int) -> int:
+        if texts:
+            vecs = self._embed_texts(texts)
+            index = self._get_index(vecs.shape[1])
+            index.add(vecs)
+            with open(self._offsets_path, "ab") as f:
+                np.asarray(offsets, dtype=np.int64).tofile(f)
+            self._offsets = np.concatenate((self._offsets, np.asarray(offsets, dtype=np.int64)))
+        self._meta["log_offset"] = log_offset
+        if self._meta.get("head_len", 0) < HEAD_BYTES:
+            self._meta["head_len"] = min(HEAD_BYTES, log_offset)
+            self._meta["log_head"] = self._log_head(self._meta["head_len"])
+        self._save_meta()
+        return len(texts)
+
+    def notify(self) -> None:
+        """
+        Schedule a background sync; cheap enough to call after every log write.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vector-memory", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️ Vector memory sync failed: {e}")
+
+    # ─── Recall ───────────────────────────────────────────────────────
+
+    def _entry(self, row: int) -> Optional[Dict[str, Any]]:
+        with open(self.log_path, "rb") as f:
+            f.seek(int(self._offsets[row]))
+            try:
+                return json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+
+    def recall(self, query: str, k: int = 4, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        The k past turns most similar to `query`, best first, as
+        {"user", "ai", "timestamp", "score"}. Never waits for a sync: while
+        the first one is still building the index, nothing is recalled.
+        """
+        if self._index is None and self._sync_lock.acquire(blocking=False):
+            try:
+                self._open()
+            finally:
+                self._sync_lock.release()
+        index = self._index
+        if index is None or len(index) == 0:
+            return []
+        q = self._embed_texts([query[:EMBED_CHARS]])[0]
+        hits = []
+        for row, score in index.search(q, k):
+            if score < min_score or row >= len(self._offsets):
+                continue
+            entry = self._entry(row)
+            if entry:
+                hits.append({
+                    "user": entry.get("user", ""),
+                    "ai": entry.get("ai", ""),
+                    "timestamp": entry.get("timestamp"),
+                    "score": score,
+                })
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "rows": len(index) if index is not None else 0,
+            "ivf": index is not None and index._centroids is not None,
+            "log_offset": self._meta.get("log_offset", 0),
+        }
+
+
+_memory: Optional[VectorMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_memory() -> VectorMemory:
+    """
+    Process-wide memory over LOG_FILE, opened on first use.
+    """
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = VectorMemory()
+    return _memory
@@ -0,0 +1,63 @@
+from aias.core import detect_traceback_issue, scan_tracebacks
+
+PYTHON_TRACEBACK = """\
+Traceback (most recent call last):
+  File "aias/agent.py", line 12, in <module>
+    main()
+  File "aias/core.py", line 40, in main
+    raise KeyError("model")
+KeyError: 'model'
+"""
+
+PYTEST_LONG = """\
+=================================== FAILURES ===================================
+____________________________________ test_x ____________________________________
+
+    def test_x():
+>       helper()
+
+tests/test_a.py:5:
+_ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _
+
+    def helper():
+>       raise ValueError("bad value")
+E       ValueError: bad value
+
+tests/test_a.py:2: ValueError
+=========================== short test summary info ============================
+FAILED tests/test_a.py::test_x - ValueError: bad value
+"""
+
+PYTEST_SHORT = """\
+=================================== FAILURES ===================================
+____________________________________ test_x ____________________________________
+tests/test_a.py:5: in test_x
+    helper()
+tests/test_a.py:2: in helper
+    raise ValueError("bad value")
+E   ValueError: bad value
+=========================== short test summary info ============================
+FAILED tests/test_a.py::test_x - ValueError: bad value
+"""
+
+
+def test_python_traceback_reports_innermost_frame():
+    issues = list(scan_tracebacks(PYTHON_TRACEBACK))
+    assert issues == [{
+        "file": "aias/core.py",
+        "line": 40,
+        "exception": "KeyError",
+        "description": "KeyError: 'model' (line 40)",
+    }]
+
+
+def test_pytest_long_report():
+    issues = list(scan_tracebacks(PYTEST_LONG))
+    assert [(i["file"], i["line"], i["exception"]) for i in issues] == [("tests/test_a.py", 2, "ValueError")]
+    assert issues[0]["description"] == "ValueError: bad value (line 2)"
+
+
+def test_pytest_short_report_strips_e_prefix():
+    issues = list(scan_tracebacks(PYTEST_SHORT))
+    assert [(i["file"], i["line"], i["exception"]) for i in issues] == [("tests/test_a.py", 2, "ValueError")]
+    assert detect_traceback_issue(PYTEST_SHORT) == ("tests/test_a.py", "ValueError: bad value (line 2)")